@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Load test the delivery service against the local Telegram stub.
+
+Usage:
+    python benchmarks/bench_delivery.py [--messages 600] [--chats 100] [--workers 8]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+PORT = 8089
+os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "stub")
+
+from telegram_stub import serve  # noqa: E402
+from intent_engine.delivery import DeliveryService  # noqa: E402
+from intent_engine.models import Post, ScoredPost, User  # noqa: E402
+from intent_engine.notify import TelegramNotifier  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=600)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    server, state = serve(PORT, latency_ms=args.latency_ms)
+    service = DeliveryService(TelegramNotifier(), workers=args.workers)
+    service.start()
+
+    users = [
+        User(id=f"user-{i}", email=f"user{i}@example.com", telegram_chat_id=str(1000 + i),
+             telegram_linked=True, skill_keywords=["python"])
+        for i in range(args.chats)
+    ]
+    done = threading.Semaphore(0)
+    outcomes = []
+
+    def callback(user, scored, ok):
+        outcomes.append(ok)
+        done.release()
+
+    started = time.monotonic()
+    for i in range(args.messages):
+        post = Post(id=f"post-{i}", platform="bench", title=f"Python role {i}",
+                    content="", url="https://example.com", timestamp=datetime.now())
+        service.submit(users[i % args.chats], ScoredPost(post=post, score=3), callback)
+    for _ in range(args.messages):
+        done.acquire()
+    elapsed = time.monotonic() - started
+
+    stats = service.get_stats()
+    print(f"{args.messages} alerts to {args.chats} chats with {args.workers} workers, {args.latency_ms:.0f}ms API latency")
+    print(f"  delivered {outcomes.count(True)}, failed {outcomes.count(False)} in {elapsed:.1f}s "
+          f"({outcomes.count(True) / elapsed:.1f} msg/s)")
+    print(f"  429s from stub: {state.counts['throttled']}")
+    print(f"  submit->delivered latency: {stats['latency']}")
+    print(f"  Telegram API latency:      {stats['telegram']['latency']}")
+
+    service.stop()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Memory per cached post: the old dataclass Post against the slotted one.
+
+Usage:
+    python benchmarks/bench_post_memory.py [window sizes ...]
+
+Builds a window of synthetic Reddit/HN-shaped posts the way the ingesters
+do (fresh strings per post) and reports bytes retained per post as
+measured by tracemalloc. The old Post is exactly the baseline dataclass,
+which kept no normalized text. Slotted posts are measured as built and
+again normalized like the engine's cache, which includes the cached text.
+"""
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intent_engine.models import Post  # noqa: E402
+from intent_engine.parse import normalize_post  # noqa: E402
+
+SIZES = [10_000, 100_000]
+SUBREDDITS = ["forhire", "freelance", "startups", "hiring", "jobbit"]
+WORDS = "we are hiring a senior python react developer remote contract budget flexible apply now".split()
+
+
+@dataclass
+class LegacyPost:
+    """The baseline Post, field for field, for comparison."""
+    id: str
+    platform: str
+    title: str
+    content: str
+    url: str
+    timestamp: datetime
+    raw_text: str = ""
+
+    def __post_init__(self):
+        self.raw_text = f"{self.title} {self.content}"
+
+
+def make_posts(cls, count: int, normalize: bool = False, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    now = datetime.now()
+    posts = []
+    for i in range(count):
+        if i % 4:
+            sub = rng.choice(SUBREDDITS)
+            # Built per post, as parsing a feed produces new strings every time
+            platform = "".join(["reddit/r/", sub])
+            post_id = "".join(["reddit_t3_", format(i, "06x")])
+            url = f"https://www.reddit.com/r/{sub}/comments/{i:06x}/post/"
+        else:
+            platform = "".join(["hacker", "news"])
+            post_id = "".join(["hn_", str(30_000_000 + i)])
+            url = f"https://news.ycombinator.com/item?id={30_000_000 + i}"
+        title = " ".join(rng.choices(WORDS, k=10))
+        content = " ".join(rng.choices(WORDS, k=rng.randint(40, 160)))
+        timestamp = now - timedelta(seconds=rng.randint(0, 86_400))
+        post = cls(id=post_id, platform=platform, title=title, content=content, url=url, timestamp=timestamp)
+        posts.append(normalize_post(post) if normalize else post)
+    return posts
+
+
+def measure(cls, count: int, normalize: bool = False) -> float:
+    """Bytes retained per post for a window of count posts."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    posts = make_posts(cls, count, normalize)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del posts
+    return (after - before) / count
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'posts':>8} {'dataclass':>12} {'slotted':>12} {'saved':>7} {'normalized':>12}")
+    for count in sizes:
+        legacy = measure(LegacyPost, count)
+        slotted = measure(Post, count)
+        normalized = measure(Post, count, normalize=True)
+        print(
+            f"{count:>8} {legacy:>10.0f} B {slotted:>10.0f} B {1 - slotted / legacy:>6.1%} "
+            f"{normalized:>10.0f} B"
+        )
+
+
+if __name__ == "__main__":
+    main()
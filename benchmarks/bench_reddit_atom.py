@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Benchmark feedparser against the streaming Atom parser on Reddit feeds.
+
+Usage:
+    python benchmarks/bench_reddit_atom.py [feed.xml ...]
+
+Pass feeds recorded with e.g. `curl -A HireSignal https://www.reddit.com/r/forhire/new/.rss`.
+Without arguments a synthetic Reddit-shaped feed is used.
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import feedparser  # noqa: E402
+from intent_engine.ingest.atom import parse_entries  # noqa: E402
+from intent_engine.ingest.reddit import RedditIngester  # noqa: E402
+
+ROUNDS = 200
+
+
+def synthetic_feed(subreddit: str = "forhire", entries: int = 25) -> bytes:
+    """A feed shaped like Reddit's /new/.rss output."""
+    now = datetime.now(timezone.utc)
+    body = (
+        "&lt;!-- SC_OFF --&gt;&lt;div class=&quot;md&quot;&gt;&lt;p&gt;We are hiring a "
+        "Python &amp;amp; React developer for a remote contract. Details at "
+        "https://example.com/job &lt;/p&gt;&lt;p&gt;Budget is flexible.&lt;/p&gt;"
+        "&lt;/div&gt;&lt;!-- SC_ON --&gt; &amp;#32; submitted by &amp;#32; "
+        "&lt;a href=&quot;https://www.reddit.com/user/someone&quot;&gt; /u/someone &lt;/a&gt;"
+    ) * 3
+    items = []
+    for i in range(entries):
+        stamp = (now - timedelta(minutes=7 * i)).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+        items.append(
+            f'<entry><author><name>/u/someone{i}</name><uri>https://www.reddit.com/user/someone{i}</uri></author>'
+            f'<category term="{subreddit}" label="r/{subreddit}"/>'
+            f'<content type="html">{body}</content><id>t3_{i:06x}</id>'
+            f'<link href="https://www.reddit.com/r/{subreddit}/comments/{i:06x}/post/" />'
+            f'<updated>{stamp}</updated><published>{stamp}</published>'
+            f'<title>[Hiring] Developer wanted #{i}</title></entry>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:media="http://search.yahoo.com/mrss/">'
+        f'<id>/r/{subreddit}/new/.rss</id><title>newest submissions : {subreddit}</title>'
+        f'<updated>{now.isoformat()}</updated>{"".join(items)}</feed>'
+    ).encode()
+
+
+def timed(fn) -> float:
+    """Mean milliseconds per call over ROUNDS calls."""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+def bench(name: str, content: bytes):
+    ingester = RedditIngester(["bench"])
+    parse = ingester._parse_entry
+
+    reference = [parse(e, "bench") for e in feedparser.parse(content).entries]
+    fast = [parse(e, "bench") for e in parse_entries(content)[0]]
+    ids = [p.id for p in reference]
+    known = set(ids[: int(len(ids) * 0.9)])
+
+    print(f"{name}: {len(content) / 1024:.1f} KiB, {len(ids)} entries, identical posts: {reference == fast}")
+    print(f"  feedparser            {timed(lambda: [parse(e, 'bench') for e in feedparser.parse(content).entries]):7.3f} ms/feed")
+    print(f"  atom, nothing seen    {timed(lambda: [parse(e, 'bench') for e in parse_entries(content)[0]]):7.3f} ms/feed")
+    print(f"  atom, 90% seen        {timed(lambda: [parse(e, 'bench') for e in parse_entries(content, known.__contains__)[0]]):7.3f} ms/feed")
+
+
+def main():
+    paths = sys.argv[1:]
+    if not paths:
+        bench("synthetic r/forhire", synthetic_feed())
+    for path in paths:
+        bench(path, Path(path).read_bytes())
+
+
+if __name__ == "__main__":
+    main()
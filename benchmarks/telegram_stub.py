@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Telegram Bot API, for delivery load tests.
+
+Implements sendMessage (plus an empty getUpdates) and enforces Telegram's
+limits: requests beyond the global or per-chat rate get a 429 with
+retry_after, like the real API.
+
+Usage:
+    python benchmarks/telegram_stub.py --port 8081 --latency-ms 50
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 python main.py
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    """Counters and simple fixed-window rate limits."""
+
+    def __init__(self, global_rate: int = 30, chat_rate: int = 1, latency_ms: float = 0):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.latency = latency_ms / 1000
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.messages = []
+        self._window = 0
+        self._window_counts = Counter()
+
+    def admit(self, chat_id: str) -> bool:
+        """Count a request against one-second windows. Returns False if over a limit."""
+        with self.lock:
+            window = int(time.monotonic())
+            if window != self._window:
+                self._window = window
+                self._window_counts.clear()
+            self._window_counts["*"] += 1
+            self._window_counts[chat_id] += 1
+            return (
+                self._window_counts["*"] <= self.global_rate
+                and self._window_counts[chat_id] <= self.chat_rate
+            )
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                with state.lock:
+                    self._reply(200, dict(state.counts))
+            elif "/getUpdates" in self.path:
+                time.sleep(1)
+                self._reply(200, {"ok": True, "result": []})
+            else:
+                self._reply(404, {"ok": False, "description": "Not Found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            if not self.path.endswith("/sendMessage"):
+                self._reply(404, {"ok": False, "description": "Not Found"})
+                return
+
+            if state.latency:
+                time.sleep(state.latency)
+
+            chat_id = str(payload.get("chat_id"))
+            if not state.admit(chat_id):
+                with state.lock:
+                    state.counts["throttled"] += 1
+                self._reply(429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                })
+                return
+
+            with state.lock:
+                state.counts["sent"] += 1
+                state.messages.append((time.monotonic(), chat_id))
+            self._reply(200, {"ok": True, "result": {"message_id": state.counts["sent"], "chat": {"id": chat_id}}})
+
+    return Handler
+
+
+def serve(port: int = 8081, **kwargs):
+    """Start the stub in a background thread. Returns (server, state)."""
+    state = StubState(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--global-rate", type=int, default=30)
+    parser.add_argument("--chat-rate", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    state = StubState(args.global_rate, args.chat_rate, args.latency_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"Telegram stub listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""asyncio runtime: ingestion, scoring, delivery and the bot on one event loop."""
+import asyncio
+import logging
+import signal
+import time
+from typing import List, Optional
+import httpx
+from .config import config
+from .metrics import ALERTS, POSTS_FETCHED, SOURCE_FETCH_SECONDS, STAGE_SECONDS
+from .models import Post, ScoredPost, User
+from .notify import AsyncTelegramNotifier, get_notifier
+from . import database
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """Runs an IntentEngine's cycle with async I/O.
+    
+    Feeds are fetched and alerts sent through one shared httpx.AsyncClient,
+    so concurrency is bounded by ASYNC_CONCURRENCY rather than thread
+    count. Supabase calls and CPU-bound scoring go through asyncio.to_thread
+    so the loop, and the bot sharing it, stay responsive.
+    """
+    
+    def __init__(self, engine, bot=None):
+        self.engine = engine
+        self.bot = bot
+        self.notifier: Optional[AsyncTelegramNotifier] = None
+        self._send_slots: Optional[asyncio.Semaphore] = None
+    
+    async def _fetch_source(self, source: str, fetch) -> List[Post]:
+        with SOURCE_FETCH_SECONDS.time(source=source):
+            posts = await fetch
+        POSTS_FETCHED.inc(len(posts), source=source)
+        return posts
+    
+    async def fetch_all(self, client: httpx.AsyncClient) -> List[Post]:
+        """Fetch all sources concurrently."""
+        results = await asyncio.gather(
+            self._fetch_source("reddit", self.engine.reddit.afetch(client)),
+            self._fetch_source("hackernews", self.engine.hackernews.afetch(client)),
+            return_exceptions=True
+        )
+        
+        posts = []
+        for name, result in zip(("Reddit", "HN"), results):
+            if isinstance(result, Exception):
+                logger.error(f"{name} fetch error: {result}")
+            else:
+                posts.extend(result)
+        return posts
+    
+    async def send(self, user: User, posts: List[ScoredPost], digest: bool = False) -> int:
+        """Send alerts to one user, recording each outcome. Returns alerts sent."""
+        async with self._send_slots:
+            if digest:
+                delivered = await self.notifier.asend_digest(user, posts)
+            else:
+                delivered = [s for s in posts if await self.notifier.asend_to_user(user, s)]
+        
+        delivered_ids = {s.post.id for s in delivered}
+        for scored in posts:
+            if scored.post.id in delivered_ids:
+                self.engine.record_sent(user, scored)
+            else:
+                self.engine.retry_later(user, [scored])
+        return len(delivered)
+    
+    async def deliver(self, user: User, matches: List[ScoredPost]) -> int:
+        """Async IntentEngine.deliver."""
+        engine = self.engine
+        user_matches = engine.with_retries(user, matches)
+        try:
+            if engine.notified.loaded:
+                pending = engine.pending_matches(user, user_matches)
+            else:
+                # Falls back to a Supabase query per user
+                pending = await asyncio.to_thread(engine.pending_matches, user, user_matches)
+            if not pending:
+                return 0
+            
+            queued = engine.enqueue_matches(user, pending)
+            if queued is not None:
+                return queued
+            return await self.send(user, pending)
+        except Exception as e:
+            logger.error(f"Error processing user {user.id}: {e}")
+            engine.retry_later(user, user_matches)
+            return 0
+    
+    async def flush_digests(self) -> int:
+        """Send digests whose window has closed."""
+        if self.engine.digests is None:
+            return 0
+        sent = await asyncio.gather(*(
+            self.send(user, posts, digest=True) for user, posts in self.engine.digests.due()
+        ))
+        return sum(sent)
+    
+    def _score(self):
+        """Blocking part of a cycle: roster refresh, scoring and dedup sync."""
+        users = self.engine.load_users()
+        if not users:
+            return users, {}
+        matches = self.engine.score_users(users)
+        self.engine.notified.sync()
+        return users, matches
+    
+    async def cycle(self, client: httpx.AsyncClient) -> int:
+        """Run one polling cycle. Returns total alerts sent."""
+        engine = self.engine
+        started = time.monotonic()
+        logger.info("Starting poll cycle...")
+        
+        with STAGE_SECONDS.time(stage="fetch"):
+            posts = await self.fetch_all(client)
+        new_posts = engine.ingest_posts(posts)
+        engine.save_snapshot(idle=True)
+        logger.info(f"Processing {len(engine.post_cache)} recent posts ({len(new_posts)} new)")
+        if not engine.post_cache:
+            return 0
+        
+        users, matches = await asyncio.to_thread(self._score)
+        logger.info(f"Processing for {len(users)} active users with Telegram linked")
+        
+        with STAGE_SECONDS.time(stage="deliver"):
+            sent = await asyncio.gather(*(self.deliver(user, matches.get(user.id, [])) for user in users))
+            total_sent = sum(sent)
+            if engine.digests is not None:
+                total_sent = await self.flush_digests()
+        ALERTS.inc(total_sent)
+        STAGE_SECONDS.observe(time.monotonic() - started, stage="cycle")
+        
+        logger.info(f"Cycle complete. Total alerts: {total_sent}")
+        return total_sent
+    
+    async def _cycle_loop(self, client: httpx.AsyncClient):
+        while self.engine.running:
+            started = time.monotonic()
+            try:
+                await self.cycle(client)
+            except Exception as e:
+                logger.error(f"Cycle error: {e}")
+            
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(0.0, config.poll_interval_seconds - elapsed))
+    
+    async def run(self):
+        """Run the cycle loop and the bot until cancelled."""
+        limits = httpx.Limits(max_connections=config.async_concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            self.notifier = AsyncTelegramNotifier(client, limiter=get_notifier().limiter)
+            self._send_slots = asyncio.Semaphore(config.async_concurrency)
+            
+            tasks = [asyncio.create_task(self._cycle_loop(client), name="engine")]
+            if self.bot is not None:
+                tasks.append(asyncio.create_task(self.bot.arun(client), name="bot"))
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _main(engine, bot=None):
+    config.validate()
+    engine.running = True
+    logger.info("Intent Engine started (asyncio runtime)")
+    logger.info(f"Monitoring: {config.reddit_subreddits}")
+    logger.info(f"Poll interval: {config.poll_interval_seconds}s")
+    engine.start_metrics_server()
+    engine.load_snapshot()
+    if engine.outbox_sender is not None:
+        # The outbox hands its rows to the delivery service's worker threads
+        if engine.delivery is not None:
+            engine.delivery.start()
+        engine.outbox_sender.start()
+    
+    # SIGINT/SIGTERM cancel the main task, which cancels everything under it
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, main_task.cancel)
+    
+    try:
+        await AsyncRuntime(engine, bot).run()
+    except asyncio.CancelledError:
+        logger.info("Shutdown signal received")
+    finally:
+        if bot is not None:
+            bot.running = False
+        await asyncio.to_thread(engine.stop)
+        await asyncio.to_thread(database.flush_notifications)
+
+
+def run(engine, bot=None):
+    """Run the engine, and the bot if given, on one event loop until SIGINT/SIGTERM."""
+    asyncio.run(_main(engine, bot))
@@ -18,15 +18,95 @@ class Config:
     # Single Telegram Bot (your bot)
     telegram_bot_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     telegram_bot_username: str = os.getenv("TELEGRAM_BOT_USERNAME", "")
+    # Override to point at a local stub server for load tests
+    telegram_api_base: str = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+    # Telegram allows ~30 messages/s overall and ~1 message/s per chat
+    telegram_global_rate: float = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+    telegram_chat_rate: float = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+    # Bot commands run on a worker pool; each chat always maps to the same worker
+    bot_workers: int = int(os.getenv("BOT_WORKERS", "4"))
+    bot_queue_size: int = int(os.getenv("BOT_QUEUE_SIZE", "100"))
+    # How many of a user's best matches /gift and welcome posts send
+    gift_top_k: int = int(os.getenv("GIFT_TOP_K", "10"))
+    # "polling" uses getUpdates, "webhook" serves updates over HTTP
+    telegram_bot_mode: str = os.getenv("TELEGRAM_BOT_MODE", "polling").lower()
+    # Public HTTPS URL registered with setWebhook; leave empty to only serve locally
+    telegram_webhook_url: str = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+    telegram_webhook_secret: str = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+    telegram_webhook_host: str = os.getenv("TELEGRAM_WEBHOOK_HOST", "0.0.0.0")
+    telegram_webhook_port: int = int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+    telegram_webhook_path: str = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook")
     
     # Polling
     poll_interval_seconds: int = int(os.getenv("POLL_INTERVAL_SECONDS", "60"))
     
+    # Engine runtime: "cycle" runs fetch/score/send in turn, "pipeline" overlaps them
+    engine_mode: str = os.getenv("ENGINE_MODE", "cycle").lower()
+    # "threads" or "asyncio" (engine and bot on one event loop)
+    runtime: str = os.getenv("RUNTIME", "threads").lower()
+    # Max concurrent HTTP requests and sends under the asyncio runtime
+    async_concurrency: int = int(os.getenv("ASYNC_CONCURRENCY", "100"))
+    delivery_workers: int = int(os.getenv("DELIVERY_WORKERS", "4"))
+    # Hand sends to background delivery workers instead of sending inline
+    async_delivery: bool = os.getenv("ASYNC_DELIVERY", "false").lower() == "true"
+    delivery_queue_size: int = int(os.getenv("DELIVERY_QUEUE_SIZE", "10000"))
+    # This host's slice of users: SHARD_INDEX of SHARD_COUNT, by a stable hash of user id
+    shard_index: int = int(os.getenv("SHARD_INDEX", "0"))
+    shard_count: int = int(os.getenv("SHARD_COUNT", "1"))
+    # Worker processes that split this host's users for scoring and delivery
+    shard_workers: int = int(os.getenv("SHARD_WORKERS", "1"))
+    pipeline_queue_size: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+    # Collect each user's matches and send them as one digest per window
+    digest_mode: bool = os.getenv("DIGEST_MODE", "false").lower() == "true"
+    digest_window_seconds: int = int(os.getenv("DIGEST_WINDOW_SECONDS", "300"))
+    # Queue alerts in a local SQLite outbox drained by a background sender
+    delivery_outbox: bool = os.getenv("DELIVERY_OUTBOX", "false").lower() == "true"
+    outbox_path: str = os.getenv("OUTBOX_PATH", ".outbox.db")
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    outbox_base_backoff_seconds: float = float(os.getenv("OUTBOX_BASE_BACKOFF_SECONDS", "30"))
+    outbox_max_backoff_seconds: float = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+    
+    # Warm-restart snapshot of the post window and ingest state; empty disables
+    snapshot_path: str = os.getenv("SNAPSHOT_PATH", ".engine_snapshot.jsonl")
+    snapshot_interval_seconds: int = int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "300"))
+    
+    # Prometheus endpoint at /metrics; 0 disables. Shard workers use the next ports up
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))
+    metrics_host: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    
     # Scoring
     score_threshold: int = int(os.getenv("SCORE_THRESHOLD", "3"))
+    # Only score new posts and users whose keywords changed each cycle
+    incremental_scoring: bool = os.getenv("INCREMENTAL_SCORING", "true").lower() == "true"
+    # "index" scores post by post, "sparse" uses batched sparse matrix products
+    scoring_backend: str = os.getenv("SCORING_BACKEND", "index").lower()
+    
+    # Notification rows are written in batches off the send path
+    notification_batch_size: int = int(os.getenv("NOTIFICATION_BATCH_SIZE", "500"))
+    notification_flush_seconds: float = float(os.getenv("NOTIFICATION_FLUSH_SECONDS", "2"))
+    
+    # Users are cached and refreshed by updated_at; full reload to catch deletes
+    roster_full_refresh_seconds: int = int(os.getenv("ROSTER_FULL_REFRESH_SECONDS", "3600"))
+    
+    # How often to pull notifications written by other processes
+    notified_sync_seconds: int = int(os.getenv("NOTIFIED_SYNC_SECONDS", "300"))
     
     # Reddit subreddits to monitor
     reddit_subreddits: list = None
+    reddit_fetch_concurrency: int = int(os.getenv("REDDIT_FETCH_CONCURRENCY", "8"))
+    reddit_request_timeout: float = float(os.getenv("REDDIT_REQUEST_TIMEOUT", "10"))
+    reddit_user_agent: str = os.getenv("REDDIT_USER_AGENT", "HireSignal/1.0 (intent engine)")
+    # Use the streaming Atom parser, falling back to feedparser on odd feeds
+    reddit_fast_parser: bool = os.getenv("REDDIT_FAST_PARSER", "true").lower() == "true"
+    
+    # Hacker News
+    hn_max_items_per_poll: int = int(os.getenv("HN_MAX_ITEMS_PER_POLL", "30"))
+    hn_fetch_concurrency: int = int(os.getenv("HN_FETCH_CONCURRENCY", "16"))
+    hn_request_timeout: float = float(os.getenv("HN_REQUEST_TIMEOUT", "10"))
+    # "newstories" polls the newest N stories, "maxitem" walks every new item ID
+    hn_ingest_mode: str = os.getenv("HN_INGEST_MODE", "newstories").lower()
+    hn_cursor_file: str = os.getenv("HN_CURSOR_FILE", ".hn_cursor.json")
+    hn_cursor_batch: int = int(os.getenv("HN_CURSOR_BATCH", "500"))
     
     # Default hiring keywords
     hiring_keywords: list = None
@@ -50,6 +130,10 @@ class Config:
             raise ValueError("SUPABASE_SERVICE_KEY is required")
         if not self.telegram_bot_token:
             raise ValueError("TELEGRAM_BOT_TOKEN is required")
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError("SHARD_INDEX must be between 0 and SHARD_COUNT - 1")
+        if self.telegram_bot_mode == "webhook" and not self.telegram_webhook_secret:
+            raise ValueError("TELEGRAM_WEBHOOK_SECRET is required in webhook mode")
         return True
 
 
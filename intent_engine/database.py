@@ -1,9 +1,12 @@
 """Supabase database client and operations."""
 import logging
 import secrets
-from typing import List, Optional, Dict, Any
+import threading
+import time
+from typing import List, Optional, Dict, Any, Tuple
 from supabase import create_client, Client
 from .config import config
+from .metrics import external_call
 
 logger = logging.getLogger(__name__)
 
@@ -18,22 +21,66 @@ def get_client() -> Client:
     return _client
 
 
-def get_active_users() -> List[Dict[str, Any]]:
+def get_active_users(columns: str = "*", page_size: int = 1000) -> List[Dict[str, Any]]:
     """Fetch all active users with Telegram linked."""
     try:
         client = get_client()
-        response = client.table("users").select("*").eq("is_active", True).not_.is_("telegram_chat_id", "null").execute()
-        return response.data or []
+        rows = []
+        offset = 0
+        while True:
+            # Paged in a stable order; PostgREST caps each response at max-rows
+            with external_call("supabase", "get_active_users"):
+                response = (
+                    client.table("users")
+                    .select(columns)
+                    .eq("is_active", True)
+                    .not_.is_("telegram_chat_id", "null")
+                    .order("id")
+                    .range(offset, offset + page_size - 1)
+                    .execute()
+                )
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
     except Exception as e:
         logger.error(f"Error fetching users: {e}")
         return []
 
 
+def get_users_updated_since(since: str, columns: str = "*", page_size: int = 1000) -> Optional[List[Dict[str, Any]]]:
+    """Fetch users (active or not) whose row changed at or after an ISO timestamp."""
+    try:
+        client = get_client()
+        rows = []
+        offset = 0
+        while True:
+            with external_call("supabase", "get_users_updated_since"):
+                response = (
+                    client.table("users")
+                    .select(columns)
+                    .gte("updated_at", since)
+                    .order("updated_at")
+                    .range(offset, offset + page_size - 1)
+                    .execute()
+                )
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+    except Exception as e:
+        logger.error(f"Error fetching users updated since {since}: {e}")
+        return None
+
+
 def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """Fetch a single user by ID."""
     try:
         client = get_client()
-        response = client.table("users").select("*").eq("id", user_id).single().execute()
+        with external_call("supabase", "get_user_by_id"):
+            response = client.table("users").select("*").eq("id", user_id).single().execute()
         return response.data
     except Exception as e:
         logger.error(f"Error fetching user {user_id}: {e}")
@@ -44,7 +91,8 @@ def get_user_by_link_code(code: str) -> Optional[Dict[str, Any]]:
     """Fetch user by their Telegram link code."""
     try:
         client = get_client()
-        response = client.table("users").select("*").eq("telegram_link_code", code).single().execute()
+        with external_call("supabase", "get_user_by_link_code"):
+            response = client.table("users").select("*").eq("telegram_link_code", code).single().execute()
         return response.data
     except Exception as e:
         logger.error(f"Error fetching user by link code: {e}")
@@ -55,7 +103,8 @@ def get_user_by_chat_id(chat_id: str) -> Optional[Dict[str, Any]]:
     """Fetch user by their Telegram chat ID."""
     try:
         client = get_client()
-        response = client.table("users").select("*").eq("telegram_chat_id", chat_id).single().execute()
+        with external_call("supabase", "get_user_by_chat_id"):
+            response = client.table("users").select("*").eq("telegram_chat_id", chat_id).single().execute()
         return response.data
     except Exception as e:
         logger.error(f"Error fetching user by chat_id: {e}")
@@ -66,10 +115,11 @@ def link_telegram(user_id: str, chat_id: str) -> bool:
     """Link a Telegram chat ID to a user."""
     try:
         client = get_client()
-        client.table("users").update({
-            "telegram_chat_id": chat_id,
-            "telegram_link_code": None  # Clear the code after linking
-        }).eq("id", user_id).execute()
+        with external_call("supabase", "link_telegram"):
+            client.table("users").update({
+                "telegram_chat_id": chat_id,
+                "telegram_link_code": None  # Clear the code after linking
+            }).eq("id", user_id).execute()
         return True
     except Exception as e:
         logger.error(f"Error linking Telegram: {e}")
@@ -81,9 +131,10 @@ def generate_link_code(user_id: str) -> Optional[str]:
     try:
         code = secrets.token_urlsafe(16)
         client = get_client()
-        client.table("users").update({
-            "telegram_link_code": code
-        }).eq("id", user_id).execute()
+        with external_call("supabase", "generate_link_code"):
+            client.table("users").update({
+                "telegram_link_code": code
+            }).eq("id", user_id).execute()
         return code
     except Exception as e:
         logger.error(f"Error generating link code: {e}")
@@ -94,35 +145,190 @@ def unlink_telegram(user_id: str) -> bool:
     """Unlink Telegram from a user."""
     try:
         client = get_client()
-        client.table("users").update({
-            "telegram_chat_id": None
-        }).eq("id", user_id).execute()
+        with external_call("supabase", "unlink_telegram"):
+            client.table("users").update({
+                "telegram_chat_id": None
+            }).eq("id", user_id).execute()
         return True
     except Exception as e:
         logger.error(f"Error unlinking Telegram: {e}")
         return False
 
 
-def update_user_last_notified(user_id: str, post_id: str) -> bool:
-    """Track that a user was notified about a post."""
+def deactivate_user(user_id: str) -> bool:
+    """Stop alerting a user, e.g. after they blocked the bot."""
     try:
         client = get_client()
-        client.table("notifications").insert({
-            "user_id": user_id,
-            "post_id": post_id
-        }).execute()
+        with external_call("supabase", "deactivate_user"):
+            client.table("users").update({
+                "is_active": False
+            }).eq("id", user_id).execute()
         return True
     except Exception as e:
-        logger.error(f"Error tracking notification: {e}")
+        logger.error(f"Error deactivating user {user_id}: {e}")
         return False
 
 
+class NotificationWriter:
+    """Write-behind buffer for notification rows.
+    
+    Rows are collected in memory and written as one bulk upsert on
+    UNIQUE(user_id, post_id) once the buffer reaches max_batch rows or
+    flush_interval_seconds has passed. Failed writes stay buffered and are
+    retried with backoff, so entries are only dropped once written.
+    """
+    
+    def __init__(self, max_batch: int = 500, flush_interval_seconds: float = 2.0,
+                 max_backoff_seconds: float = 60.0):
+        self.max_batch = max_batch
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._pending: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.failures = 0
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notification-writer", daemon=True)
+            self._thread.start()
+    
+    def add(self, user_id: str, post_id: str):
+        """Buffer a notification row."""
+        with self._lock:
+            self._pending[(user_id, post_id)] = {"user_id": user_id, "post_id": post_id}
+            full = len(self._pending) >= self.max_batch
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+    
+    def pending_for(self, user_id: str) -> set:
+        """Post IDs buffered for a user but not yet written."""
+        with self._lock:
+            return {post_id for (uid, post_id) in self._pending if uid == user_id}
+    
+    def flush(self) -> bool:
+        """Write everything buffered. Returns False if a write failed."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = list(self._pending.items())[:self.max_batch]
+                if not batch:
+                    return True
+                
+                try:
+                    client = get_client()
+                    with external_call("supabase", "write_notifications"):
+                        client.table("notifications").upsert(
+                            [row for _, row in batch],
+                            on_conflict="user_id,post_id",
+                            ignore_duplicates=True,
+                            returning="minimal"
+                        ).execute()
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Error writing {len(batch)} notifications ({len(self)} buffered): {e}")
+                    return False
+                
+                with self._lock:
+                    for key, _ in batch:
+                        self._pending.pop(key, None)
+                logger.debug(f"Wrote {len(batch)} notifications")
+    
+    def _run(self):
+        """Flush on size or interval, backing off while writes fail."""
+        delay = self.flush_interval_seconds
+        while not self._stopped.is_set():
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            if self.flush():
+                delay = self.flush_interval_seconds
+            else:
+                delay = min(delay * 2, self.max_backoff_seconds)
+    
+    def close(self, timeout: float = 10.0) -> bool:
+        """Stop the background thread and flush what is left."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        
+        deadline = time.monotonic() + timeout
+        while not self.flush():
+            if time.monotonic() >= deadline:
+                logger.error(f"Shutting down with {len(self)} notifications unwritten")
+                return False
+            time.sleep(1)
+        return True
+
+
+_writer: Optional[NotificationWriter] = None
+
+
+def get_notification_writer() -> NotificationWriter:
+    """Get or create the notification write-behind buffer."""
+    global _writer
+    if _writer is None:
+        _writer = NotificationWriter(
+            max_batch=config.notification_batch_size,
+            flush_interval_seconds=config.notification_flush_seconds
+        )
+    return _writer
+
+
+def flush_notifications() -> bool:
+    """Flush buffered notification rows; call on shutdown."""
+    if _writer is None:
+        return True
+    return _writer.close()
+
+
+def update_user_last_notified(user_id: str, post_id: str) -> bool:
+    """Track that a user was notified about a post (written in the background)."""
+    get_notification_writer().add(user_id, post_id)
+    return True
+
+
 def get_user_notified_posts(user_id: str) -> set:
     """Get all post IDs a user has been notified about."""
+    buffered = get_notification_writer().pending_for(user_id)
     try:
         client = get_client()
-        response = client.table("notifications").select("post_id").eq("user_id", user_id).execute()
-        return {row["post_id"] for row in (response.data or [])}
+        with external_call("supabase", "get_user_notified_posts"):
+            response = client.table("notifications").select("post_id").eq("user_id", user_id).execute()
+        return {row["post_id"] for row in (response.data or [])} | buffered
     except Exception as e:
         logger.error(f"Error fetching user notifications: {e}")
-        return set()
+        return buffered
+
+
+def get_notifications_since(since: str, page_size: int = 1000) -> Optional[List[Dict[str, Any]]]:
+    """Fetch all notification rows created at or after an ISO timestamp."""
+    try:
+        client = get_client()
+        rows = []
+        offset = 0
+        while True:
+            with external_call("supabase", "get_notifications_since"):
+                response = (
+                    client.table("notifications")
+                    .select("user_id,post_id,created_at")
+                    .gte("created_at", since)
+                    .order("created_at")
+                    .range(offset, offset + page_size - 1)
+                    .execute()
+                )
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+    except Exception as e:
+        logger.error(f"Error fetching notifications since {since}: {e}")
+        return None
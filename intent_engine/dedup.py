@@ -0,0 +1,120 @@
+"""In-process record of which posts each user was notified about."""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional, Set, Tuple
+from . import database
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_created_at(value: str) -> float:
+    """Epoch seconds from a Supabase timestamptz string."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class NotifiedStore:
+    """Per-user set of notified post IDs, limited to the post window.
+    
+    Loaded from the notifications table once, then kept current locally on
+    every send. Rows written by other processes are picked up periodically
+    by querying rows from a margin before the last created_at seen, since
+    a row committed late can carry an earlier timestamp; rows seen twice
+    are merged. Posts older than the window can't be re-sent anyway, so
+    older rows are dropped.
+    """
+    
+    def __init__(self, window_hours: float = 24, sync_interval_seconds: float = 300,
+                 sync_margin_seconds: float = 300):
+        self.window_seconds = window_hours * 3600
+        self.sync_interval_seconds = sync_interval_seconds
+        self.sync_margin_seconds = sync_margin_seconds
+        self.watermark: Optional[str] = None
+        self.loaded = False
+        self._by_user: Dict[str, Dict[str, float]] = {}
+        self._order: Deque[Tuple[float, str, str]] = deque()
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._order)
+    
+    def _add(self, user_id: str, post_id: str, notified_at: float):
+        posts = self._by_user.setdefault(user_id, {})
+        if post_id not in posts:
+            posts[post_id] = notified_at
+            self._order.append((notified_at, user_id, post_id))
+    
+    def add(self, user_id: str, post_id: str):
+        """Record a notification sent by this process."""
+        with self._lock:
+            self._add(user_id, post_id, time.time())
+    
+    def contains(self, user_id: str, post_id: str) -> bool:
+        with self._lock:
+            return post_id in self._by_user.get(user_id, ())
+    
+    def posts_for(self, user_id: str) -> Set[str]:
+        """Post IDs the user was notified about within the window."""
+        with self._lock:
+            return set(self._by_user.get(user_id, ()))
+    
+    def _apply(self, rows: list):
+        """Merge notification rows and advance the watermark."""
+        with self._lock:
+            for row in rows:
+                self._add(row["user_id"], row["post_id"], _parse_created_at(row["created_at"]))
+            if rows:
+                self.watermark = rows[-1]["created_at"]
+    
+    def _expire(self):
+        """Drop notifications older than the window."""
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            while self._order and self._order[0][0] < cutoff:
+                notified_at, user_id, post_id = self._order.popleft()
+                posts = self._by_user.get(user_id)
+                if posts is not None and posts.get(post_id) == notified_at:
+                    del posts[post_id]
+                    if not posts:
+                        del self._by_user[user_id]
+    
+    def load(self) -> bool:
+        """Load all notifications in the window. Returns False on failure."""
+        since = datetime.fromtimestamp(time.time() - self.window_seconds, timezone.utc).isoformat()
+        rows = database.get_notifications_since(since)
+        if rows is None:
+            return False
+        
+        self._apply(rows)
+        self.watermark = self.watermark or since
+        self.loaded = True
+        self._last_sync = time.monotonic()
+        logger.info(f"Loaded {len(rows)} notifications from the last {self.window_seconds / 3600:.0f}h")
+        return True
+    
+    def sync(self, force: bool = False) -> bool:
+        """Load on first use, then pull rows written elsewhere since the watermark."""
+        if not self.loaded:
+            return self.load()
+        
+        if not force and time.monotonic() - self._last_sync < self.sync_interval_seconds:
+            return True
+        
+        since = datetime.fromtimestamp(
+            _parse_created_at(self.watermark) - self.sync_margin_seconds, timezone.utc
+        ).isoformat()
+        rows = database.get_notifications_since(since)
+        if rows is None:
+            return False
+        
+        self._apply(rows)
+        self._expire()
+        self._last_sync = time.monotonic()
+        logger.debug(f"Synced {len(rows)} notifications, {len(self)} tracked")
+        return True
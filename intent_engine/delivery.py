@@ -0,0 +1,139 @@
+"""Background delivery of alerts through the Telegram notifier."""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Set, Tuple
+from .metrics import LatencyStats, RateMeter
+from .models import ScoredPost, User
+from .notify import TelegramNotifier
+
+logger = logging.getLogger(__name__)
+
+DeliveryCallback = Callable[[User, ScoredPost, bool], None]
+
+
+class DeliveryService:
+    """Sends alerts on a pool of worker threads.
+    
+    Callers submit (user, scored post, callback), or a list of posts to go
+    out as one digest, and return immediately; a worker sends through the
+    notifier, whose pooled session and token buckets keep us inside
+    Telegram's global and per-chat limits, then reports each post's
+    outcome through the callback. A post already queued for a
+    user is not queued again.
+    """
+    
+    def __init__(self, notifier: TelegramNotifier, workers: int = 4, queue_size: int = 10000):
+        self.notifier = notifier
+        self.workers = workers
+        self._queue: "queue.Queue[Tuple[User, List[ScoredPost], DeliveryCallback, float]]" = queue.Queue(queue_size)
+        self._in_flight: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        
+        # Time from submit to delivery outcome
+        self.latency = LatencyStats()
+        self.throughput = RateMeter()
+        self.delivered = 0
+        self.failed = 0
+        self.rejected = 0
+    
+    def start(self):
+        """Start worker threads."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"delivery-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Delivery service started with {self.workers} workers")
+    
+    def stop(self, timeout: float = 10.0):
+        """Let workers drain what is queued, then stop them."""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+    
+    def pending(self) -> int:
+        return self._queue.qsize()
+    
+    def is_pending(self, user_id: str, post_id: str) -> bool:
+        """Whether an alert is queued or being sent right now."""
+        return (user_id, post_id) in self._in_flight
+    
+    def submit(self, user: User, scored: ScoredPost, callback: DeliveryCallback) -> bool:
+        """Queue an alert. Returns False if it is already queued or the queue is full."""
+        return bool(self.submit_digest(user, [scored], callback))
+    
+    def submit_digest(self, user: User, posts: List[ScoredPost],
+                      callback: DeliveryCallback) -> List[ScoredPost]:
+        """Queue several alerts to go out as one digest.
+        
+        Posts already queued for the user are dropped. Returns the posts
+        that were queued; the callback fires once for each of them only.
+        """
+        with self._lock:
+            posts = [s for s in posts if (user.id, s.post.id) not in self._in_flight]
+            keys = {(user.id, s.post.id) for s in posts}
+            self._in_flight.update(keys)
+        if not posts:
+            return []
+        
+        try:
+            self._queue.put_nowait((user, posts, callback, time.monotonic()))
+            return posts
+        except queue.Full:
+            with self._lock:
+                self._in_flight.difference_update(keys)
+                self.rejected += len(posts)
+            logger.warning(f"Delivery queue full, deferring {len(posts)} alerts for {user.email}")
+            return []
+    
+    def _send(self, user: User, posts: List[ScoredPost]) -> List[ScoredPost]:
+        """Send one queued job. Returns the posts delivered."""
+        if len(posts) == 1:
+            return posts if self.notifier.send_to_user(user, posts[0]) else []
+        return self.notifier.send_digest(user, posts)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                user, posts, callback, submitted = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            
+            try:
+                delivered = {s.post.id for s in self._send(user, posts)}
+            except Exception as e:
+                logger.error(f"Delivery error for {user.email}: {e}")
+                delivered = set()
+            
+            self.latency.record(time.monotonic() - submitted)
+            with self._lock:
+                for scored in posts:
+                    self._in_flight.discard((user.id, scored.post.id))
+                self.delivered += len(delivered)
+                self.failed += len(posts) - len(delivered)
+            for _ in delivered:
+                self.throughput.mark()
+            
+            for scored in posts:
+                try:
+                    callback(user, scored, scored.post.id in delivered)
+                except Exception as e:
+                    logger.error(f"Delivery callback error for {user.email}: {e}")
+    
+    def get_stats(self) -> dict:
+        """Queue depth, outcomes, throughput and latency."""
+        return {
+            "queued": self.pending(),
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "per_second": round(self.throughput.rate(), 2),
+            "latency": self.latency.summary(),
+            "telegram": self.notifier.get_stats(),
+        }
@@ -0,0 +1,58 @@
+"""Per-user collection of matches for digest delivery."""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from .models import ScoredPost, User
+
+
+class DigestCollector:
+    """Holds each user's matches until their digest window closes.
+    
+    The window starts with the first match collected for a user, so a
+    user never waits longer than window_seconds for an alert, and a burst
+    of matches inside the window goes out together.
+    """
+    
+    def __init__(self, window_seconds: float = 300):
+        self.window_seconds = window_seconds
+        self._pending: Dict[str, Tuple[float, User, Dict[str, ScoredPost]]] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def add(self, user: User, posts: List[ScoredPost]) -> int:
+        """Collect matches for a user. Returns how many were not already held."""
+        with self._lock:
+            opened, _, held = self._pending.get(user.id, (time.monotonic(), user, {}))
+            before = len(held)
+            for scored in posts:
+                held.setdefault(scored.post.id, scored)
+            # Keep the latest user record so the digest goes to the current chat
+            self._pending[user.id] = (opened, user, held)
+            return len(held) - before
+    
+    def is_pending(self, user_id: str, post_id: str) -> bool:
+        entry = self._pending.get(user_id)
+        return entry is not None and post_id in entry[2]
+    
+    def pending_posts(self) -> int:
+        with self._lock:
+            return sum(len(held) for _, _, held in self._pending.values())
+    
+    def due(self, force: bool = False,
+            select: Optional[Callable[[str], bool]] = None) -> List[Tuple[User, List[ScoredPost]]]:
+        """Remove and return digests whose window has closed, best matches first."""
+        now = time.monotonic()
+        result = []
+        
+        with self._lock:
+            for user_id, (opened, user, held) in list(self._pending.items()):
+                if select is not None and not select(user_id):
+                    continue
+                if force or now - opened >= self.window_seconds:
+                    del self._pending[user_id]
+                    posts = sorted(held.values(), key=lambda s: (-s.score, -s.post.epoch))
+                    result.append((user, posts))
+        
+        return result
@@ -1,14 +1,29 @@
 """Main engine orchestrating the multi-tenant polling loop."""
 import logging
+import threading
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict
+from collections import defaultdict
+from typing import Callable, List, Dict, Optional, Set
 from .config import config
 from .ingest import RedditIngester, HackerNewsIngester
-from .scoring import filter_posts_for_user
+from .scoring import create_keyword_index, filter_posts_for_user
+from .parse import normalize_post
 from .notify import get_notifier
-from .models import Post, User
-from . import database
+from .delivery import DeliveryService
+from .digest import DigestCollector
+from .outbox import Outbox, OutboxSender
+from .models import Post, ScoredPost, ScoringWatermark, User
+from .window import PostWindow
+from .dedup import NotifiedStore
+from .roster import UserRoster
+from .shard import ShardSpec
+from .topk import TopMatches, rank_matches
+from .metrics import (
+    ALERTS, MATCHES, POSTS_FETCHED, POSTS_INGESTED, SOURCE_FETCH_SECONDS, STAGE_SECONDS,
+    MetricsServer, registry
+)
+from . import database, snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -19,24 +34,113 @@ class IntentEngine:
     """Multi-tenant engine that polls once and fans out to all users."""
     
     def __init__(self):
-        self.reddit = RedditIngester(config.reddit_subreddits)
-        self.hackernews = HackerNewsIngester()
+        self.reddit = RedditIngester(
+            config.reddit_subreddits,
+            seen_ttl_hours=MAX_POST_AGE_HOURS,
+            concurrency=config.reddit_fetch_concurrency,
+            request_timeout=config.reddit_request_timeout,
+            user_agent=config.reddit_user_agent,
+            fast_parser=config.reddit_fast_parser
+        )
+        self.hackernews = HackerNewsIngester(
+            max_items_per_poll=config.hn_max_items_per_poll,
+            seen_ttl_hours=MAX_POST_AGE_HOURS,
+            concurrency=config.hn_fetch_concurrency,
+            request_timeout=config.hn_request_timeout,
+            mode=config.hn_ingest_mode,
+            cursor_file=config.hn_cursor_file,
+            cursor_batch=config.hn_cursor_batch
+        )
         self.notifier = get_notifier()
+        self.delivery = None
+        if config.async_delivery:
+            self.delivery = DeliveryService(
+                self.notifier, config.delivery_workers, config.delivery_queue_size
+            )
+        self.digests = None
+        if config.digest_mode and not config.delivery_outbox:
+            self.digests = DigestCollector(config.digest_window_seconds)
+        self.outbox = None
+        self.outbox_sender = None
+        if config.delivery_outbox:
+            self.outbox = Outbox(
+                config.outbox_path,
+                base_backoff_seconds=config.outbox_base_backoff_seconds,
+                max_backoff_seconds=config.outbox_max_backoff_seconds,
+                max_attempts=config.outbox_max_attempts
+            )
+            self.outbox_sender = OutboxSender(
+                self.outbox, self.notifier,
+                on_sent=self.record_sent,
+                on_blocked=self._on_blocked,
+                delivery=self.delivery,
+                digest=config.digest_mode,
+                max_age_seconds=MAX_POST_AGE_HOURS * 3600
+            )
         self.running = False
-        self.post_cache: Dict[str, Post] = {}
+        self.post_cache = PostWindow(MAX_POST_AGE_HOURS)
+        self.keyword_index = create_keyword_index()
+        self.watermarks: Dict[str, ScoringWatermark] = {}
+        self.top_matches = TopMatches(config.gift_top_k)
+        self.shard = ShardSpec(config.shard_index, config.shard_count)
+        self.roster = UserRoster(config.roster_full_refresh_seconds, self.shard)
+        self.notified = NotifiedStore(MAX_POST_AGE_HOURS, config.notified_sync_seconds)
+        # Failed matches per user; the pipeline touches these from several threads
+        self._retry: Dict[str, List[ScoredPost]] = {}
+        self._retry_lock = threading.Lock()
+        # Users linked or re-keyworded since startup, whose alerts may have been
+        # recorded by another process (the bot's gift, another shard) not yet synced
+        self._recheck_notified: Set[str] = set()
+        self._last_snapshot = time.monotonic()
+        # Source state matching what the window holds, for snapshots
+        self._ingest_state: Optional[Dict[str, dict]] = None
+        self.metrics_server: Optional[MetricsServer] = None
+        self._register_gauges()
     
+    def _register_gauges(self):
+        """Sizes read at scrape time."""
+        gauge = registry.gauge(
+            "intent_engine_cache_size", "Entries held by each in-memory cache", ["cache"]
+        )
+        gauge.set_function(lambda: len(self.post_cache), cache="post_window")
+        gauge.set_function(lambda: len(self.reddit.seen_ids), cache="reddit_seen_ids")
+        gauge.set_function(lambda: len(self.hackernews.seen_ids), cache="hackernews_seen_ids")
+        gauge.set_function(lambda: len(self.notified), cache="notified")
+        gauge.set_function(lambda: len(self.roster), cache="roster")
+        gauge.set_function(self._retry_backlog, cache="retry")
+        if self.digests is not None:
+            gauge.set_function(self.digests.pending_posts, cache="digest")
+        if self.outbox is not None:
+            gauge.set_function(lambda: self.outbox.counts()["pending"], cache="outbox")
+    
+    def start_metrics_server(self, port: Optional[int] = None):
+        """Serve /metrics when METRICS_PORT is set."""
+        port = config.metrics_port if port is None else port
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(config.metrics_host, port)
+            self.metrics_server.start()
+        except OSError as e:
+            logger.error(f"Could not serve metrics on port {port}: {e}")
+    
+    @STAGE_SECONDS.timed(stage="fetch")
     def fetch_all(self) -> List[Post]:
         """Fetch posts from all sources."""
         posts = []
         
         try:
-            reddit_posts = self.reddit.fetch()
+            with SOURCE_FETCH_SECONDS.time(source="reddit"):
+                reddit_posts = self.reddit.fetch()
+            POSTS_FETCHED.inc(len(reddit_posts), source="reddit")
             posts.extend(reddit_posts)
         except Exception as e:
             logger.error(f"Reddit fetch error: {e}")
         
         try:
-            hn_posts = self.hackernews.fetch()
+            with SOURCE_FETCH_SECONDS.time(source="hackernews"):
+                hn_posts = self.hackernews.fetch()
+            POSTS_FETCHED.inc(len(hn_posts), source="hackernews")
             posts.extend(hn_posts)
         except Exception as e:
             logger.error(f"HN fetch error: {e}")
@@ -45,75 +149,383 @@ class IntentEngine:
     
     def filter_recent_posts(self, posts: List[Post]) -> List[Post]:
         """Filter posts to only include those from the last 24 hours."""
-        cutoff = datetime.now() - timedelta(hours=MAX_POST_AGE_HOURS)
-        return [p for p in posts if p.timestamp >= cutoff]
+        cutoff = (datetime.now() - timedelta(hours=MAX_POST_AGE_HOURS)).timestamp()
+        return [p for p in posts if p.epoch >= cutoff]
     
-    def update_cache(self, posts: List[Post]):
-        """Update the post cache with new posts."""
+    def update_cache(self, posts: List[Post]) -> List[Post]:
+        """Update the post cache with new posts. Returns the posts added."""
+        added = []
         for post in posts:
             if post.id not in self.post_cache:
-                self.post_cache[post.id] = post
+                normalize_post(post)
+                self.post_cache.add(post)
+                added.append(post)
+        
+        evicted = self.post_cache.expire()
+        if evicted:
+            logger.debug(f"Expired {evicted} posts from cache")
+            self.top_matches.expire(datetime.now() - timedelta(hours=MAX_POST_AGE_HOURS))
+        return added
+    
+    @STAGE_SECONDS.timed(stage="ingest")
+    def ingest_posts(self, posts: List[Post]) -> List[Post]:
+        """Add freshly fetched posts to the cache. Returns the new ones."""
+        added = self.update_cache(self.filter_recent_posts(posts))
+        POSTS_INGESTED.inc(len(added))
+        return added
+    
+    @STAGE_SECONDS.timed(stage="score")
+    def score_users(self, users: List[User]) -> Dict[str, List[ScoredPost]]:
+        """Score cached posts for users, skipping work already done.
+        
+        Users whose keywords or threshold changed (or who are new) are scored
+        against the whole cache; everyone else only against posts that
+        arrived since their watermark.
+        """
+        if not config.incremental_scoring:
+            matches = self.keyword_index.score_posts(self.post_cache.values())
+            for user in users:
+                self.top_matches.reset(user.id)
+                self.top_matches.add(user.id, matches.get(user.id, ()))
+            MATCHES.inc(sum(len(m) for m in matches.values()))
+            return matches
+        
+        groups: Dict[int, Set[str]] = defaultdict(set)
+        for user in users:
+            mark = self.watermarks.get(user.id)
+            if mark is None or mark.scoring_hash != user.scoring_hash:
+                groups[0].add(user.id)
+            elif mark.last_seq < self.post_cache.last_seq:
+                groups[mark.last_seq].add(user.id)
+        
+        for user_id in groups.get(0, ()):
+            self.top_matches.reset(user_id)
         
-        cutoff = datetime.now() - timedelta(hours=MAX_POST_AGE_HOURS)
-        self.post_cache = {
-            pid: post for pid, post in self.post_cache.items()
-            if post.timestamp >= cutoff
+        matches: Dict[str, List[ScoredPost]] = defaultdict(list)
+        for seq, user_ids in groups.items():
+            posts = self.post_cache.values() if seq == 0 else self.post_cache.since(seq)
+            for user_id, scored in self.keyword_index.score_posts(posts, user_ids).items():
+                matches[user_id].extend(scored)
+                self.top_matches.add(user_id, scored)
+        
+        self.watermarks = {
+            user.id: ScoringWatermark(self.post_cache.last_seq, user.scoring_hash)
+            for user in users
         }
+        self._prune_retries(self.watermarks)
+        
+        MATCHES.inc(sum(len(m) for m in matches.values()))
+        logger.info(
+            f"Scored {len(groups.get(0, ()))} users against full cache, "
+            f"{sum(len(ids) for seq, ids in groups.items() if seq)} incrementally"
+        )
+        return matches
     
-    def process_for_user(self, user: User, posts: List[Post]) -> int:
-        """Process posts for a single user. Returns alerts sent."""
-        notified_ids = database.get_user_notified_posts(user.id)
-        new_posts = [p for p in posts if p.id not in notified_ids]
+    def top_matches_for(self, user: User) -> List[ScoredPost]:
+        """A user's best matches in the window, ranked. Safe to call from any thread.
         
-        if not new_posts:
-            return 0
+        Users the engine hasn't scored yet with their current keywords (e.g.
+        just linked) are scored against a snapshot of the cache instead, as
+        are users whose kept matches expired; the latter are refilled here
+        so scoring never has to rescan the window for them.
+        """
+        mark = self.watermarks.get(user.id)
+        if mark is not None and mark.scoring_hash == user.scoring_hash and user.id in self.top_matches:
+            if not self.top_matches.complete(user.id):
+                self.top_matches.refill(user.id, filter_posts_for_user(self.post_cache.snapshot(), user))
+            return self.top_matches.top(user.id)
         
-        scored_posts = filter_posts_for_user(new_posts, user)
+        scored = filter_posts_for_user(self.post_cache.snapshot(), user)
+        return rank_matches(scored)[:config.gift_top_k]
+    
+    def _retry_backlog(self) -> int:
+        with self._retry_lock:
+            return sum(len(pending) for pending in self._retry.values())
+    
+    def _prune_retries(self, keep):
+        """Drop retries of users no longer in the roster, in place."""
+        with self._retry_lock:
+            for user_id in [user_id for user_id in self._retry if user_id not in keep]:
+                del self._retry[user_id]
+    
+    def has_retries(self, user_id: str) -> bool:
+        """Whether a user has matches waiting to be retried."""
+        with self._retry_lock:
+            return bool(self._retry.get(user_id))
+    
+    def with_retries(self, user: User, matches: List[ScoredPost]) -> List[ScoredPost]:
+        """Add back matches that failed to send in an earlier cycle."""
+        with self._retry_lock:
+            pending = self._retry.pop(user.id, [])
+        if not pending:
+            return matches
+        
+        seen = {s.post.id for s in matches}
+        for scored in pending:
+            if scored.post.id not in seen and scored.post.id in self.post_cache:
+                matches.append(scored)
+                seen.add(scored.post.id)
+        return matches
+    
+    def pending_matches(self, user: User, matches: List[ScoredPost]) -> List[ScoredPost]:
+        """Matches the user hasn't been sent and that aren't already on their way."""
+        if not matches:
+            return []
+        
+        if self.notified.loaded:
+            notified_ids = self.notified.posts_for(user.id)
+            if user.id in self._recheck_notified:
+                self._recheck_notified.discard(user.id)
+                recorded = database.get_user_notified_posts(user.id)
+                for post_id in recorded - notified_ids:
+                    self.notified.add(user.id, post_id)
+                notified_ids = notified_ids | recorded
+        else:
+            notified_ids = database.get_user_notified_posts(user.id)
+        scored_posts = [s for s in matches if s.post.id not in notified_ids]
+        if self.delivery is not None:
+            scored_posts = [s for s in scored_posts if not self.delivery.is_pending(user.id, s.post.id)]
         
+        if self.outbox is not None:
+            queued = self.outbox.queued_for(user.id)
+            scored_posts = [s for s in scored_posts if s.post.id not in queued]
+        return scored_posts
+    
+    def enqueue_matches(self, user: User, scored_posts: List[ScoredPost]) -> Optional[int]:
+        """Hand matches to the outbox or digest collector when either is on.
+        
+        Returns how many were taken, or None if they should be sent now.
+        """
+        if self.outbox is not None:
+            # The outbox sender delivers these; in digest mode they wait out the window
+            delay = config.digest_window_seconds if config.digest_mode else 0
+            return self.outbox.enqueue(user, scored_posts, delay)
+        
+        if self.digests is not None:
+            # Sent later by flush_digests once the user's window closes
+            return self.digests.add(user, scored_posts)
+        return None
+    
+    def process_for_user(self, user: User, matches: List[ScoredPost]) -> int:
+        """Deliver a user's matched posts. Returns alerts sent."""
+        scored_posts = self.pending_matches(user, matches)
         if not scored_posts:
             return 0
         
+        queued = self.enqueue_matches(user, scored_posts)
+        if queued is not None:
+            return queued
+        
         sent = 0
         for scored in scored_posts:
-            if self.notifier.send_to_user(user, scored):
-                database.update_user_last_notified(user.id, scored.post.id)
+            if self.delivery is not None:
+                # Outcome is reported later through _on_delivered
+                if self.delivery.submit(user, scored, self._on_delivered):
+                    sent += 1
+                else:
+                    self.retry_later(user, [scored])
+            elif self.notifier.send_to_user(user, scored):
+                self.record_sent(user, scored)
                 sent += 1
+            else:
+                self.retry_later(user, [scored])
         
         return sent
     
+    def record_sent(self, user: User, scored: ScoredPost):
+        """Remember a delivered alert so it is never sent twice."""
+        database.update_user_last_notified(user.id, scored.post.id)
+        self.notified.add(user.id, scored.post.id)
+    
+    def retry_later(self, user: User, posts: List[ScoredPost]):
+        """Keep matches that failed to send for the user's next delivery."""
+        with self._retry_lock:
+            self._retry.setdefault(user.id, []).extend(posts)
+    
+    def _send_digest(self, user: User, posts: List[ScoredPost]) -> int:
+        """Send collected matches as a digest. Returns alerts sent or queued."""
+        if self.delivery is not None:
+            queued = self.delivery.submit_digest(user, posts, self._on_delivered)
+            if queued:
+                return len(queued)
+            self.retry_later(user, posts)
+            return 0
+        
+        delivered = self.notifier.send_digest(user, posts)
+        delivered_ids = {s.post.id for s in delivered}
+        for scored in posts:
+            if scored.post.id in delivered_ids:
+                self.record_sent(user, scored)
+            else:
+                self.retry_later(user, [scored])
+        return len(delivered)
+    
+    def flush_digests(self, force: bool = False,
+                      select: Optional[Callable[[str], bool]] = None) -> int:
+        """Send digests whose window has closed. Returns alerts sent or queued."""
+        if self.digests is None:
+            return 0
+        
+        total = 0
+        for user, posts in self.digests.due(force, select):
+            try:
+                total += self._send_digest(user, posts)
+            except Exception as e:
+                logger.error(f"Error sending digest to {user.id}: {e}")
+                self.retry_later(user, posts)
+        return total
+    
+    def _on_blocked(self, user: User):
+        """Outbox callback for a user who blocked the bot."""
+        if database.deactivate_user(user.id):
+            logger.info(f"Deactivated {user.email} after they blocked the bot")
+    
+    def _on_delivered(self, user: User, scored: ScoredPost, ok: bool):
+        """Delivery service callback."""
+        if ok:
+            self.record_sent(user, scored)
+        else:
+            self.retry_later(user, [scored])
+    
+    def deliver(self, user: User, matches: List[ScoredPost]) -> int:
+        """Deliver new and previously failed matches to a user. Returns alerts sent."""
+        user_matches = self.with_retries(user, matches)
+        try:
+            sent = self.process_for_user(user, user_matches)
+            if sent > 0:
+                if self.digests is not None:
+                    verb = "Collected"
+                elif self.outbox is not None or self.delivery is not None:
+                    verb = "Queued"
+                else:
+                    verb = "Sent"
+                logger.info(f"{verb} {sent} alerts to {user.email}")
+            return sent
+        except Exception as e:
+            logger.error(f"Error processing user {user.id}: {e}")
+            self.retry_later(user, user_matches)
+            return 0
+    
+    @STAGE_SECONDS.timed(stage="roster")
+    def load_users(self) -> List[User]:
+        """Refresh the cached roster and return the active users to score for.
+        
+        Only users whose keywords or threshold changed are re-indexed.
+        """
+        first_load = len(self.roster) == 0
+        changes = self.roster.refresh()
+        for user_id in changes.removed:
+            self.keyword_index.remove_user(user_id)
+            self.top_matches.remove(user_id)
+            self._recheck_notified.discard(user_id)
+        if not first_load:
+            # The notified store was loaded at startup, so only later arrivals need this
+            self._recheck_notified.update(changes.scoring_changed)
+        for user in changes.updated:
+            if user.id in changes.scoring_changed:
+                self.keyword_index.update_user(user)
+        
+        if changes.scoring_changed or changes.removed:
+            logger.info(
+                f"Keyword index updated for {len(changes.scoring_changed)} users, "
+                f"{len(changes.removed)} removed"
+            )
+        return self.roster.active_users()
+    
+    def load_snapshot(self) -> int:
+        """Warm the post cache and ingest state from the last snapshot, if any."""
+        self._last_snapshot = time.monotonic()
+        if not config.snapshot_path:
+            return 0
+        restored = snapshot.load(self, config.snapshot_path)
+        self.mark_ingested()
+        return restored
+    
+    def mark_ingested(self, state: Optional[Dict[str, dict]] = None):
+        """Record source state whose posts are all in the window now.
+        
+        Defaults to every source's current state, which is only right
+        while no fetch is running; the pipeline passes per-source state
+        captured when each fetch returned.
+        """
+        if not config.snapshot_path:
+            return
+        if state is None:
+            state = snapshot.ingest_state(self)
+        # Rebound rather than updated, so a concurrent save sees either version
+        self._ingest_state = {**(self._ingest_state or {}), **state}
+    
+    def save_snapshot(self, force: bool = False, idle: bool = False):
+        """Write a warm-restart snapshot if one is due.
+        
+        Saves the ingest state last passed to mark_ingested. Set idle when
+        no fetch is running and everything fetched is in the window, so the
+        sources' current state can be saved instead.
+        """
+        if not config.snapshot_path:
+            return
+        if not force and time.monotonic() - self._last_snapshot < config.snapshot_interval_seconds:
+            return
+        
+        started = time.monotonic()
+        try:
+            if idle:
+                self.mark_ingested()
+            ingest = self._ingest_state
+            if ingest is None or len(ingest) < len(snapshot.SOURCES):
+                # No state known to match the window yet
+                return
+            count = snapshot.save(self, config.snapshot_path, ingest)
+            logger.info(f"Saved snapshot of {count} posts in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Error saving snapshot: {e}")
+        self._last_snapshot = time.monotonic()
+    
+    @STAGE_SECONDS.timed(stage="cycle")
     def process_cycle(self) -> int:
         """Run one polling cycle. Returns total alerts sent."""
         logger.info("Starting poll cycle...")
         
         posts = self.fetch_all()
-        recent_posts = self.filter_recent_posts(posts)
-        self.update_cache(recent_posts)
+        new_posts = self.ingest_posts(posts)
+        self.save_snapshot(idle=True)
         
-        all_recent = list(self.post_cache.values())
-        logger.info(f"Processing {len(all_recent)} recent posts")
+        logger.info(f"Processing {len(self.post_cache)} recent posts ({len(new_posts)} new)")
         
-        if not all_recent:
+        if not self.post_cache:
             return 0
         
-        users_data = database.get_active_users()
-        users = [User.from_dict(u) for u in users_data]
+        return self.process_users()
+    
+    def process_users(self) -> int:
+        """Score the cache for this shard's users and deliver. Returns total alerts sent."""
+        users = self.load_users()
         
         logger.info(f"Processing for {len(users)} active users with Telegram linked")
         
         if not users:
             return 0
         
-        total_sent = 0
-        for user in users:
-            try:
-                sent = self.process_for_user(user, all_recent)
-                if sent > 0:
-                    logger.info(f"Sent {sent} alerts to {user.email}")
-                total_sent += sent
-            except Exception as e:
-                logger.error(f"Error processing user {user.id}: {e}")
+        matches = self.score_users(users)
+        with STAGE_SECONDS.time(stage="dedup_sync"):
+            self.notified.sync()
+        
+        with STAGE_SECONDS.time(stage="deliver"):
+            total_sent = 0
+            for user in users:
+                total_sent += self.deliver(user, matches.get(user.id, []))
+            
+            if self.digests is not None:
+                collected = total_sent
+                total_sent = self.flush_digests()
+                logger.info(f"Collected {collected} alerts for digests, {self.digests.pending_posts()} waiting")
+        ALERTS.inc(total_sent)
         
         logger.info(f"Cycle complete. Total alerts: {total_sent}")
+        if self.delivery is not None:
+            logger.info(f"Delivery stats: {self.delivery.get_stats()}")
+        if self.outbox_sender is not None:
+            logger.info(f"Outbox stats: {self.outbox_sender.get_stats()}")
         return total_sent
     
     def run(self):
@@ -124,15 +536,45 @@ class IntentEngine:
         logger.info("Intent Engine started")
         logger.info(f"Monitoring: {config.reddit_subreddits}")
         logger.info(f"Poll interval: {config.poll_interval_seconds}s")
+        self.start_metrics_server()
+        self.load_snapshot()
+        
+        if config.shard_workers > 1:
+            # Scoring and delivery happen in the worker processes
+            from .shard import ShardPool
+            ShardPool(self, config.shard_workers).run()
+            return
+        
+        if self.delivery is not None:
+            self.delivery.start()
+        if self.outbox_sender is not None:
+            self.outbox_sender.start()
+        
+        if config.engine_mode == "pipeline":
+            from .pipeline import Pipeline
+            Pipeline(self).run()
+            return
         
         while self.running:
+            started = time.monotonic()
             try:
                 self.process_cycle()
             except Exception as e:
                 logger.error(f"Cycle error: {e}")
             
-            time.sleep(config.poll_interval_seconds)
+            # Sleep only for what is left of the interval so cycles don't drift
+            elapsed = time.monotonic() - started
+            time.sleep(max(0.0, config.poll_interval_seconds - elapsed))
     
     def stop(self):
         self.running = False
+        self.flush_digests(force=True)
+        self.save_snapshot(force=True)
+        if self.outbox_sender is not None:
+            # Anything still queued stays in the outbox for the next start
+            self.outbox_sender.stop()
+        if self.delivery is not None:
+            self.delivery.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
         logger.info("Intent Engine stopped")
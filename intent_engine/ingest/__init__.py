@@ -1,5 +1,6 @@
 """Data ingestion modules."""
 from .reddit import RedditIngester
 from .hackernews import HackerNewsIngester
+from .seen import SeenIds
 
-__all__ = ["RedditIngester", "HackerNewsIngester"]
+__all__ = ["RedditIngester", "HackerNewsIngester", "SeenIds"]
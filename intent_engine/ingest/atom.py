@@ -0,0 +1,119 @@
+"""Streaming Atom parser for Reddit feeds.
+
+A lighter alternative to feedparser for the one feed shape we consume.
+It produces entry dicts with the same keys RedditIngester._parse_entry
+reads from feedparser entries, and skips entries whose id is already
+known before doing any per-entry work beyond reading the XML.
+"""
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+CHUNK_SIZE = 64 * 1024
+
+_TEXT_TYPES = {None, "text", "html", "text/plain", "text/html"}
+
+
+class AtomParseError(Exception):
+    """Feed is not an Atom feed we can handle; use feedparser instead."""
+
+
+def _parse_date(value: Optional[str]) -> Optional[time.struct_time]:
+    """Parse an RFC 3339 date into a UTC struct_time like feedparser does."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.replace(tzinfo=None).timetuple()
+
+
+def _text(element: ET.Element) -> str:
+    """Text of a text construct, rejecting inline XHTML we don't handle."""
+    if element.get("type") not in _TEXT_TYPES:
+        raise AtomParseError(f"unsupported {element.tag} type {element.get('type')}")
+    return (element.text or "").strip()
+
+
+def _entry_dict(entry: ET.Element) -> dict:
+    """Build a feedparser-compatible dict from an <entry> element."""
+    data = {}
+    content = None
+
+    for child in entry:
+        tag = child.tag
+        if tag == ATOM_NS + "id":
+            data["id"] = (child.text or "").strip()
+        elif tag == ATOM_NS + "title":
+            data["title"] = _text(child)
+        elif tag == ATOM_NS + "summary":
+            data["summary"] = _text(child)
+        elif tag == ATOM_NS + "content":
+            content = _text(child)
+        elif tag == ATOM_NS + "link":
+            if "link" not in data and child.get("rel", "alternate") == "alternate":
+                data["link"] = child.get("href", "")
+        elif tag == ATOM_NS + "published":
+            data["published_parsed"] = _parse_date(child.text)
+        elif tag == ATOM_NS + "updated":
+            data["updated_parsed"] = _parse_date(child.text)
+
+    # feedparser exposes text/html content as the summary when there is none
+    if "summary" not in data and content is not None:
+        data["summary"] = content
+
+    return data
+
+
+def parse_entries(content: bytes, skip_id: Optional[Callable[[str], bool]] = None) -> Tuple[List[dict], int]:
+    """Stream-parse an Atom feed.
+
+    Returns (entries, total) where entries excludes any whose id skip_id
+    reports as already known, and total counts every entry in the feed.
+    Raises AtomParseError if the document is malformed or not Atom.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    entries = []
+    total = 0
+    depth = 0
+    skipping = False
+
+    try:
+        for offset in range(0, len(content), CHUNK_SIZE):
+            parser.feed(content[offset:offset + CHUNK_SIZE])
+            for event, element in parser.read_events():
+                if event == "start":
+                    if depth == 0 and element.tag != ATOM_NS + "feed":
+                        raise AtomParseError(f"not an Atom feed: {element.tag}")
+                    depth += 1
+                    continue
+
+                depth -= 1
+                tag = element.tag
+
+                if depth == 2 and tag == ATOM_NS + "id" and skip_id is not None:
+                    # Ids come before most fields in Reddit entries, so a
+                    # known entry is dropped without building anything
+                    skipping = skip_id((element.text or "").strip())
+                elif depth == 1 and tag == ATOM_NS + "entry":
+                    total += 1
+                    if not skipping:
+                        entries.append(_entry_dict(element))
+                    skipping = False
+                    element.clear()
+        parser.close()
+    except ET.ParseError as e:
+        raise AtomParseError(str(e)) from e
+
+    if depth != 0:
+        raise AtomParseError("truncated feed")
+
+    return entries, total
@@ -1,50 +1,136 @@
 """Hacker News API ingester."""
+import asyncio
+import json
 import logging
+import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Set, Optional
+from requests.adapters import HTTPAdapter
+from typing import List, Optional, Tuple
+from ..metrics import external_call
 from ..models import Post
+from .seen import SeenIds
 
 logger = logging.getLogger(__name__)
 
 HN_API_BASE = "https://hacker-news.firebaseio.com/v0"
 REQUEST_TIMEOUT = 10
 
+# Item types worth scoring when walking the full item range
+CURSOR_ITEM_TYPES = {"story", "job"}
+# Skip past an item that keeps failing after this many polls
+CURSOR_MAX_STALLED_POLLS = 5
+
 
 class HackerNewsIngester:
     """Ingests posts from Hacker News API."""
     
-    def __init__(self, max_items_per_poll: int = 30):
+    def __init__(self, max_items_per_poll: int = 30, seen_ttl_hours: float = 24,
+                 concurrency: int = 16, request_timeout: float = REQUEST_TIMEOUT,
+                 mode: str = "newstories", cursor_file: Optional[str] = None,
+                 cursor_batch: int = 500):
         self.max_items_per_poll = max_items_per_poll
-        self.seen_ids: Set[int] = set()
+        self.seen_ids = SeenIds(seen_ttl_hours)
         self.last_max_id: Optional[int] = None
+        self.concurrency = max(1, concurrency)
+        self.request_timeout = request_timeout
+        
+        # "newstories" polls the top of newstories.json; "maxitem" walks every
+        # item id since last_max_id so bursts between polls are not missed
+        self.mode = mode
+        self.cursor_file = cursor_file
+        self.cursor_batch = cursor_batch
+        self._stalled_polls = 0
+        if self.mode == "maxitem":
+            self.last_max_id = self._load_cursor()
+        
+        # One pooled session shared by all fetch threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="hn-fetch"
+            )
+        return self._executor
     
     def _fetch_new_story_ids(self) -> List[int]:
         """Fetch latest story IDs."""
         try:
-            resp = requests.get(
-                f"{HN_API_BASE}/newstories.json",
-                timeout=REQUEST_TIMEOUT
-            )
-            resp.raise_for_status()
+            with external_call("hackernews", "newstories"):
+                resp = self.session.get(
+                    f"{HN_API_BASE}/newstories.json",
+                    timeout=self.request_timeout
+                )
+                resp.raise_for_status()
             return resp.json()[:self.max_items_per_poll]
         except Exception as e:
             logger.error(f"Error fetching HN story IDs: {e}")
             return []
     
+    def _fetch_max_item_id(self) -> Optional[int]:
+        """Fetch the current largest item ID."""
+        try:
+            with external_call("hackernews", "maxitem"):
+                resp = self.session.get(
+                    f"{HN_API_BASE}/maxitem.json",
+                    timeout=self.request_timeout
+                )
+                resp.raise_for_status()
+            return int(resp.json())
+        except Exception as e:
+            logger.error(f"Error fetching HN max item: {e}")
+            return None
+    
+    def _load_cursor(self) -> Optional[int]:
+        """Load the persisted item cursor, if any."""
+        if not self.cursor_file or not os.path.exists(self.cursor_file):
+            return None
+        try:
+            with open(self.cursor_file) as f:
+                cursor = json.load(f).get("last_max_id")
+            logger.info(f"Resuming HN ingestion after item {cursor}")
+            return cursor
+        except Exception as e:
+            logger.error(f"Error loading HN cursor: {e}")
+            return None
+    
+    def _save_cursor(self):
+        """Persist the item cursor so a restart resumes where we left off."""
+        if not self.cursor_file or self.last_max_id is None:
+            return
+        try:
+            tmp_path = f"{self.cursor_file}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"last_max_id": self.last_max_id}, f)
+            os.replace(tmp_path, self.cursor_file)
+        except Exception as e:
+            logger.error(f"Error saving HN cursor: {e}")
+    
     def _fetch_item(self, item_id: int) -> Optional[dict]:
         """Fetch a single item by ID."""
         try:
-            resp = requests.get(
-                f"{HN_API_BASE}/item/{item_id}.json",
-                timeout=REQUEST_TIMEOUT
-            )
-            resp.raise_for_status()
+            with external_call("hackernews", "item"):
+                resp = self.session.get(
+                    f"{HN_API_BASE}/item/{item_id}.json",
+                    timeout=self.request_timeout
+                )
+                resp.raise_for_status()
             return resp.json()
         except Exception as e:
             logger.error(f"Error fetching HN item {item_id}: {e}")
             return None
     
+    def fetch_items(self, item_ids: List[int]) -> List[Optional[dict]]:
+        """Fetch items concurrently. Failed items come back as None."""
+        if len(item_ids) <= 1:
+            return [self._fetch_item(i) for i in item_ids]
+        return list(self._get_executor().map(self._fetch_item, item_ids))
+    
     def _parse_item(self, item: dict) -> Optional[Post]:
         """Parse an HN item into a Post."""
         if not item or item.get("deleted") or item.get("dead"):
@@ -66,23 +152,132 @@ class HackerNewsIngester:
             timestamp=timestamp
         )
     
-    def fetch(self) -> List[Post]:
-        """Fetch new posts from Hacker News."""
+    async def _aget_json(self, client, path: str, semaphore: Optional[asyncio.Semaphore] = None):
+        """GET an API path on an httpx.AsyncClient. Returns None on failure."""
+        operation = path.split("/")[0].replace(".json", "")
+        try:
+            if semaphore is None:
+                with external_call("hackernews", operation):
+                    resp = await client.get(f"{HN_API_BASE}/{path}", timeout=self.request_timeout)
+            else:
+                async with semaphore:
+                    with external_call("hackernews", operation):
+                        resp = await client.get(f"{HN_API_BASE}/{path}", timeout=self.request_timeout)
+            resp.raise_for_status()
+            return resp.json()
+        except Exception as e:
+            logger.error(f"Error fetching HN {path}: {e}")
+            return None
+    
+    async def afetch_items(self, client, item_ids: List[int]) -> List[Optional[dict]]:
+        """Async fetch_items, at most `concurrency` requests at a time."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return list(await asyncio.gather(*(
+            self._aget_json(client, f"item/{item_id}.json", semaphore) for item_id in item_ids
+        )))
+    
+    def _cursor_range(self, max_id: int) -> Tuple[List[int], int]:
+        """Item IDs to fetch this poll and the last ID of the range."""
+        if self.last_max_id is None:
+            # First run without a saved cursor: start one batch back
+            self.last_max_id = max(0, max_id - self.cursor_batch)
+        
+        # Oldest first, capped per poll; the rest is picked up next poll
+        end_id = min(max_id, self.last_max_id + self.cursor_batch)
+        item_ids = [
+            i for i in range(self.last_max_id + 1, end_id + 1)
+            if i not in self.seen_ids
+        ]
+        return item_ids, end_id
+    
+    def _advance_cursor(self, item_ids: List[int], items: List[Optional[dict]],
+                        end_id: int, max_id: int) -> List[Post]:
+        """Turn walked items into posts and move the cursor past what loaded."""
         new_posts = []
-        story_ids = self._fetch_new_story_ids()
+        first_failed = None
+        for item_id, item in zip(item_ids, items):
+            if item is None:
+                # Very new items can briefly come back null; retry them
+                if first_failed is None:
+                    first_failed = item_id
+                continue
+            
+            self.seen_ids.add(item_id)
+            if item.get("type") not in CURSOR_ITEM_TYPES:
+                continue
+            post = self._parse_item(item)
+            if post:
+                new_posts.append(post)
+                logger.debug(f"New HN post: {post.title[:50]}...")
+        
+        # Only advance past items that loaded, unless one is stuck for good
+        if first_failed is None:
+            self.last_max_id = end_id
+            self._stalled_polls = 0
+        elif first_failed - 1 > self.last_max_id:
+            self.last_max_id = first_failed - 1
+            self._stalled_polls = 0
+        else:
+            self._stalled_polls += 1
+            if self._stalled_polls >= CURSOR_MAX_STALLED_POLLS:
+                logger.warning(f"Skipping HN item {first_failed} after {self._stalled_polls} failed polls")
+                self.last_max_id = first_failed
+                self._stalled_polls = 0
+        self._save_cursor()
+        
+        logger.info(
+            f"Walked {len(item_ids)} HN items up to {end_id} (max {max_id}), "
+            f"{len(new_posts)} new stories"
+        )
+        return new_posts
+    
+    def _fetch_since_cursor(self) -> List[Post]:
+        """Walk every item ID created since the last poll."""
+        max_id = self._fetch_max_item_id()
+        if max_id is None:
+            return []
         
-        for story_id in story_ids:
-            if story_id in self.seen_ids:
+        item_ids, end_id = self._cursor_range(max_id)
+        return self._advance_cursor(item_ids, self.fetch_items(item_ids), end_id, max_id)
+    
+    def _collect_stories(self, story_ids: List[int], unseen_ids: List[int],
+                         items: List[Optional[dict]]) -> List[Post]:
+        """Turn fetched newstories items into posts."""
+        new_posts = []
+        for story_id, item in zip(unseen_ids, items):
+            # Items that failed to load are left unseen and retried next poll
+            if item is None:
                 continue
             
             self.seen_ids.add(story_id)
-            item = self._fetch_item(story_id)
-            
-            if item:
-                post = self._parse_item(item)
-                if post:
-                    new_posts.append(post)
-                    logger.debug(f"New HN post: {post.title[:50]}...")
+            post = self._parse_item(item)
+            if post:
+                new_posts.append(post)
+                logger.debug(f"New HN post: {post.title[:50]}...")
         
         logger.info(f"Fetched {len(story_ids)} HN stories, {len(new_posts)} new")
+        logger.debug(f"HN seen IDs: {len(self.seen_ids)} tracked, {self.seen_ids.evictions} evicted")
         return new_posts
+    
+    def fetch(self) -> List[Post]:
+        """Fetch new posts from Hacker News."""
+        if self.mode == "maxitem":
+            return self._fetch_since_cursor()
+        
+        story_ids = self._fetch_new_story_ids()
+        unseen_ids = [i for i in story_ids if i not in self.seen_ids]
+        return self._collect_stories(story_ids, unseen_ids, self.fetch_items(unseen_ids))
+    
+    async def afetch(self, client) -> List[Post]:
+        """Fetch new posts on the event loop through an httpx.AsyncClient."""
+        if self.mode == "maxitem":
+            max_id = await self._aget_json(client, "maxitem.json")
+            if max_id is None:
+                return []
+            item_ids, end_id = self._cursor_range(int(max_id))
+            items = await self.afetch_items(client, item_ids)
+            return self._advance_cursor(item_ids, items, end_id, int(max_id))
+        
+        story_ids = (await self._aget_json(client, "newstories.json") or [])[:self.max_items_per_poll]
+        unseen_ids = [i for i in story_ids if i not in self.seen_ids]
+        return self._collect_stories(story_ids, unseen_ids, await self.afetch_items(client, unseen_ids))
@@ -1,19 +1,54 @@
 """Reddit RSS feed ingester."""
+import asyncio
 import logging
+import threading
 import feedparser
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Set
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
+from ..metrics import external_call
 from ..models import Post
+from .atom import AtomParseError, parse_entries
+from .seen import SeenIds
 
 logger = logging.getLogger(__name__)
 
+REQUEST_TIMEOUT = 10
+USER_AGENT = "HireSignal/1.0 (intent engine)"
+
 
 class RedditIngester:
     """Ingests posts from Reddit RSS feeds."""
     
-    def __init__(self, subreddits: List[str]):
+    def __init__(self, subreddits: List[str], seen_ttl_hours: float = 24,
+                 concurrency: int = 8, request_timeout: float = REQUEST_TIMEOUT,
+                 user_agent: str = USER_AGENT, fast_parser: bool = True):
         self.subreddits = subreddits
-        self.seen_ids: Set[str] = set()
+        self.fast_parser = fast_parser
+        self.seen_ids = SeenIds(seen_ttl_hours)
+        self.concurrency = max(1, concurrency)
+        self.request_timeout = request_timeout
+        
+        # One pooled session shared by all fetch threads
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
+        # Last ETag / Last-Modified per subreddit, for conditional requests
+        self.validators: Dict[str, Dict[str, str]] = {}
+        self._validators_lock = threading.Lock()
+        self.not_modified = 0
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="reddit-fetch"
+            )
+        return self._executor
     
     def _get_feed_url(self, subreddit: str) -> str:
         """Generate RSS feed URL for a subreddit."""
@@ -42,30 +77,131 @@ class RedditIngester:
             timestamp=timestamp
         )
     
-    def fetch(self) -> List[Post]:
-        """Fetch new posts from all configured subreddits."""
+    def _conditional_headers(self, subreddit: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since from the last response."""
+        headers = {}
+        cached = self.validators.get(subreddit, {})
+        if "etag" in cached:
+            headers["If-None-Match"] = cached["etag"]
+        if "last_modified" in cached:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+    
+    def _store_validators(self, subreddit: str, headers):
+        validators = {}
+        if headers.get("ETag"):
+            validators["etag"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            validators["last_modified"] = headers["Last-Modified"]
+        with self._validators_lock:
+            self.validators[subreddit] = validators
+    
+    def validators_state(self) -> Dict[str, Dict[str, str]]:
+        """Copy of the validators, for snapshots taken while fetches run."""
+        with self._validators_lock:
+            return dict(self.validators)
+    
+    def _fetch_feed(self, subreddit: str) -> Optional[bytes]:
+        """Download a feed. Returns None if it is unchanged since last fetch."""
+        with external_call("reddit", "feed"):
+            resp = self.session.get(
+                self._get_feed_url(subreddit),
+                headers=self._conditional_headers(subreddit),
+                timeout=self.request_timeout
+            )
+            if resp.status_code == 304:
+                return None
+            resp.raise_for_status()
+        
+        self._store_validators(subreddit, resp.headers)
+        return resp.content
+    
+    def _fetch_subreddit(self, subreddit: str) -> Tuple[str, Optional[bytes]]:
+        """Download one subreddit. Content is None if unchanged or failed."""
+        try:
+            content = self._fetch_feed(subreddit)
+            if content is None:
+                self.not_modified += 1
+                logger.debug(f"r/{subreddit} not modified")
+            return subreddit, content
+        except Exception as e:
+            logger.error(f"Error fetching r/{subreddit}: {e}")
+            return subreddit, None
+    
+    def _parse_feed(self, subreddit: str, content: bytes) -> Tuple[list, int]:
+        """Parse feed bytes into (entries not yet seen, total entries)."""
+        if self.fast_parser:
+            try:
+                return parse_entries(content, skip_id=self.seen_ids.__contains__)
+            except AtomParseError as e:
+                logger.warning(f"Falling back to feedparser for r/{subreddit}: {e}")
+        
+        feed = feedparser.parse(content)
+        if feed.bozo and feed.bozo_exception:
+            logger.warning(f"Feed parse warning for r/{subreddit}: {feed.bozo_exception}")
+        return feed.entries, len(feed.entries)
+    
+    async def _afetch_subreddit(self, client, subreddit: str,
+                                semaphore: asyncio.Semaphore) -> Tuple[str, Optional[bytes]]:
+        """Async _fetch_subreddit over an httpx.AsyncClient."""
+        try:
+            async with semaphore:
+                with external_call("reddit", "feed"):
+                    resp = await client.get(
+                        self._get_feed_url(subreddit),
+                        headers={"User-Agent": self.session.headers["User-Agent"],
+                                 **self._conditional_headers(subreddit)},
+                        timeout=self.request_timeout
+                    )
+            if resp.status_code == 304:
+                self.not_modified += 1
+                logger.debug(f"r/{subreddit} not modified")
+                return subreddit, None
+            resp.raise_for_status()
+            
+            self._store_validators(subreddit, resp.headers)
+            return subreddit, resp.content
+        except Exception as e:
+            logger.error(f"Error fetching r/{subreddit}: {e}")
+            return subreddit, None
+    
+    def _collect(self, results) -> List[Post]:
+        """Parse downloaded feeds into posts not seen before."""
         new_posts = []
         
-        for subreddit in self.subreddits:
+        for subreddit, content in results:
+            if content is None:
+                continue
+            
             try:
-                feed_url = self._get_feed_url(subreddit)
-                feed = feedparser.parse(feed_url)
-                
-                if feed.bozo and feed.bozo_exception:
-                    logger.warning(f"Feed parse warning for r/{subreddit}: {feed.bozo_exception}")
-                
-                for entry in feed.entries:
-                    post = self._parse_entry(entry, subreddit)
-                    
-                    if post.id not in self.seen_ids:
-                        self.seen_ids.add(post.id)
-                        new_posts.append(post)
-                        logger.debug(f"New Reddit post: {post.title[:50]}...")
-                
-                logger.info(f"Fetched {len(feed.entries)} entries from r/{subreddit}, {len([p for p in new_posts if subreddit in p.platform])} new")
-                
+                entries, total = self._parse_feed(subreddit, content)
             except Exception as e:
-                logger.error(f"Error fetching r/{subreddit}: {e}")
+                logger.error(f"Error parsing r/{subreddit}: {e}")
                 continue
+            
+            subreddit_new = 0
+            for entry in entries:
+                post = self._parse_entry(entry, subreddit)
+                
+                if post.id not in self.seen_ids:
+                    self.seen_ids.add(post.id)
+                    new_posts.append(post)
+                    subreddit_new += 1
+                    logger.debug(f"New Reddit post: {post.title[:50]}...")
+            
+            logger.info(f"Fetched {total} entries from r/{subreddit}, {subreddit_new} new")
         
+        logger.debug(f"Reddit seen IDs: {len(self.seen_ids)} tracked, {self.seen_ids.evictions} evicted")
         return new_posts
+    
+    def fetch(self) -> List[Post]:
+        """Fetch new posts from all configured subreddits."""
+        return self._collect(self._get_executor().map(self._fetch_subreddit, self.subreddits))
+    
+    async def afetch(self, client) -> List[Post]:
+        """Fetch new posts from all subreddits concurrently on the event loop."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(
+            self._afetch_subreddit(client, subreddit, semaphore) for subreddit in self.subreddits
+        ))
+        return self._collect(results)
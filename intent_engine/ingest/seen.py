@@ -0,0 +1,69 @@
+"""Bounded set of recently seen item IDs."""
+import threading
+import time
+from collections import deque
+from typing import Deque, Hashable, List, Optional, Set, Tuple
+
+
+class SeenIds:
+    """Set of seen IDs that forgets entries once they are older than a TTL.
+    
+    IDs are stored in a rotating series of generations, each covering
+    ttl / generations seconds. When the oldest generation falls entirely
+    outside the TTL it is dropped in one step, so memory is bounded by the
+    number of IDs seen in one TTL (plus one generation) regardless of uptime.
+    Safe to share between fetch threads and snapshots.
+    """
+    
+    def __init__(self, ttl_hours: float = 24, generations: int = 24):
+        self.ttl_seconds = ttl_hours * 3600
+        self.span_seconds = self.ttl_seconds / generations
+        self._generations: Deque[Tuple[float, Set[Hashable]]] = deque()
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(ids) for _, ids in self._generations)
+    
+    def __contains__(self, item_id: Hashable) -> bool:
+        with self._lock:
+            return self._contains(item_id)
+    
+    def _contains(self, item_id: Hashable) -> bool:
+        return any(item_id in ids for _, ids in self._generations)
+    
+    def _rotate(self, now: float):
+        """Start a new generation if due and drop generations past the TTL."""
+        if not self._generations or now - self._generations[-1][0] >= self.span_seconds:
+            self._generations.append((now, set()))
+        
+        # A generation expires once its newest possible entry is past the TTL
+        while now - self._generations[0][0] >= self.ttl_seconds + self.span_seconds:
+            _, ids = self._generations.popleft()
+            self.evictions += len(ids)
+    
+    def add(self, item_id: Hashable, now: Optional[float] = None) -> bool:
+        """Record an ID. Returns True if it had not been seen."""
+        with self._lock:
+            self._rotate(time.time() if now is None else now)
+            if self._contains(item_id):
+                return False
+            self._generations[-1][1].add(item_id)
+            return True
+    
+    @property
+    def generations(self) -> int:
+        return len(self._generations)
+    
+    def state(self) -> List[Tuple[float, List[Hashable]]]:
+        """Generations as plain lists, for snapshots."""
+        with self._lock:
+            return [(started, list(ids)) for started, ids in self._generations]
+    
+    def restore(self, state: List[Tuple[float, List[Hashable]]]):
+        """Replace contents with generations saved by state()."""
+        with self._lock:
+            self._generations = deque((started, set(ids)) for started, ids in state)
+            if self._generations:
+                self._rotate(time.time())
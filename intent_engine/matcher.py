@@ -0,0 +1,70 @@
+"""Multi-pattern keyword matching."""
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Normalize a keyword the same way extract_keywords does."""
+    return keyword.lower().strip()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton that finds every keyword in a text in one pass."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        self.keywords: Set[str] = set()
+
+        for keyword in keywords:
+            if keyword and keyword not in self.keywords:
+                self.keywords.add(keyword)
+                self._insert(keyword)
+
+        self._build_links()
+
+    def _insert(self, keyword: str):
+        """Add a keyword to the trie."""
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].append(keyword)
+
+    def _build_links(self):
+        """Compute failure links breadth-first and merge outputs."""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def search(self, text: str) -> Set[str]:
+        """Return the set of keywords occurring anywhere in text."""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        found: Set[str] = set()
+        node = 0
+
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+
+        return found
@@ -1,22 +1,64 @@
 """Data models for the intent engine."""
+import sys
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Union
 
 
-@dataclass
 class Post:
-    """Normalized post from any source."""
-    id: str
-    platform: str
-    title: str
-    content: str
-    url: str
-    timestamp: datetime
-    raw_text: str = ""
+    """Normalized post from any source.
+    
+    The engine keeps a day of these in memory, so they are slotted (no
+    per-instance __dict__), platform and id strings are interned, raw_text
+    is built on demand, and the timestamp is stored as epoch seconds in
+    `epoch`; `timestamp` still reads and writes a naive local datetime.
+    """
+    __slots__ = (
+        "id", "platform", "title", "content", "url", "epoch",
+        # Filled in once by parse.normalize_post
+        "normalized_text",
+        # Arrival order in the engine's post cache
+        "seq",
+    )
+    
+    def __init__(self, id: str, platform: str, title: str, content: str, url: str,
+                 timestamp: Union[datetime, int, float]):
+        self.id = sys.intern(id)
+        self.platform = sys.intern(platform)
+        self.title = title
+        self.content = content
+        self.url = url
+        self.timestamp = timestamp
+        self.normalized_text: Optional[str] = None
+        self.seq = 0
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.epoch)
+    
+    @timestamp.setter
+    def timestamp(self, value: Union[datetime, int, float]):
+        self.epoch = int(value.timestamp() if isinstance(value, datetime) else value)
+    
+    @property
+    def raw_text(self) -> str:
+        return f"{self.title} {self.content}"
     
-    def __post_init__(self):
-        self.raw_text = f"{self.title} {self.content}"
+    def _key(self) -> tuple:
+        return (self.id, self.platform, self.title, self.content, self.url, self.epoch)
+    
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._key() == other._key()
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return (
+            f"Post(id={self.id!r}, platform={self.platform!r}, title={self.title!r}, "
+            f"content={self.content!r}, url={self.url!r}, timestamp={self.timestamp!r})"
+        )
 
 
 @dataclass
@@ -43,6 +85,12 @@ class User:
     is_active: bool = True
     score_threshold: int = 3
     
+    @property
+    def scoring_hash(self) -> int:
+        """Hash of everything that affects how posts score for this user."""
+        keywords = tuple(k.lower().strip() for k in self.skill_keywords)
+        return hash((keywords, self.score_threshold))
+    
     @classmethod
     def from_dict(cls, data: dict) -> "User":
         """Create User from database row."""
@@ -59,3 +107,10 @@ class User:
             is_active=data.get("is_active", True),
             score_threshold=data.get("score_threshold", 3)
         )
+
+
+@dataclass
+class ScoringWatermark:
+    """How far through the post cache a user has been scored."""
+    last_seq: int
+    scoring_hash: int
@@ -1,14 +1,55 @@
 """Telegram notification module - single bot for all users."""
+import asyncio
 import html
 import logging
+import re
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from typing import List, Optional
 from .models import ScoredPost, User
 from .config import config
+from .metrics import LatencyStats, external_call, registry
+from .ratelimit import ChatRateLimiter
 
 logger = logging.getLogger(__name__)
 
-TELEGRAM_API = "https://api.telegram.org"
+TELEGRAM_API = config.telegram_api_base
 REQUEST_TIMEOUT = 10
+# Give up on a message after this many 429 responses in a row
+MAX_RATE_LIMIT_RETRIES = 3
+# Never wait longer than this for a single retry_after
+MAX_RETRY_AFTER_SECONDS = 60
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_TITLE_LIMIT = 200
+
+_TAG_RE = re.compile(r'<[^>]+>')
+
+TELEGRAM_MESSAGES = registry.counter(
+    "intent_engine_telegram_messages_total",
+    "Alert messages by outcome (sent, failed, throttled)",
+    ["outcome"]
+)
+
+
+class TelegramAPIError(Exception):
+    """Non-successful Telegram Bot API response."""
+    
+    def __init__(self, status: int, description: str, retry_after: Optional[float] = None):
+        super().__init__(f"{status}: {description}")
+        self.status = status
+        self.description = description
+        self.retry_after = retry_after
+    
+    @property
+    def is_blocked(self) -> bool:
+        return self.status == 403 and "bot was blocked" in self.description.lower()
+    
+    @property
+    def is_parse_error(self) -> bool:
+        return self.status == 400 and "parse" in self.description.lower()
 
 
 class TelegramNotifier:
@@ -16,6 +57,88 @@ class TelegramNotifier:
     
     def __init__(self):
         self.bot_token = config.telegram_bot_token
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(4, config.delivery_workers))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        self.limiter = ChatRateLimiter(config.telegram_global_rate, config.telegram_chat_rate)
+        self.latency = LatencyStats()
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+        # Chats that reported the bot as blocked, until a caller handles them;
+        # only kept once a consumer (the outbox sender) asks for them
+        self.track_blocked = False
+        self.blocked_chats = set()
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, name: str):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+        TELEGRAM_MESSAGES.inc(outcome=name)
+    
+    def _mark_blocked(self, user: User):
+        logger.warning(f"User {user.email} blocked the bot")
+        if not self.track_blocked:
+            return
+        with self._stats_lock:
+            self.blocked_chats.add(str(user.telegram_chat_id))
+    
+    def pop_blocked(self, chat_id: str) -> bool:
+        """Whether a chat blocked the bot since last asked."""
+        with self._stats_lock:
+            if str(chat_id) in self.blocked_chats:
+                self.blocked_chats.discard(str(chat_id))
+                return True
+            return False
+    
+    def get_stats(self) -> dict:
+        """Send counters and API latency."""
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "latency": self.latency.summary(),
+        }
+    
+    def _check_response(self, chat_id: str, resp) -> Optional[dict]:
+        """Body of a successful response, or None if rate limited and worth retrying."""
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {"ok": resp.status_code < 400, "description": resp.text}
+        
+        if resp.status_code == 429:
+            retry_after = (body.get("parameters") or {}).get("retry_after", 1)
+            self._count("throttled")
+            logger.warning(f"Telegram rate limit for chat {chat_id}, retrying after {retry_after}s")
+            self.limiter.pause(chat_id, min(retry_after, MAX_RETRY_AFTER_SECONDS))
+            return None
+        
+        if resp.status_code >= 400 or not body.get("ok", True):
+            raise TelegramAPIError(resp.status_code, body.get("description", resp.text))
+        return body
+    
+    def _send(self, payload: dict) -> dict:
+        """Call sendMessage, respecting rate limits and retry_after."""
+        chat_id = str(payload["chat_id"])
+        url = f"{TELEGRAM_API}/bot{self.bot_token}/sendMessage"
+        
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire(chat_id)
+            
+            started = time.monotonic()
+            with external_call("telegram", "sendMessage"):
+                resp = self.session.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+            self.latency.record(time.monotonic() - started)
+            
+            body = self._check_response(chat_id, resp)
+            if body is not None:
+                return body
+        
+        raise TelegramAPIError(429, "rate limited")
     
     def _escape_html(self, text: str) -> str:
         """Escape HTML special characters."""
@@ -50,30 +173,29 @@ class TelegramNotifier:
         message = self._format_message(scored)
         
         try:
-            url = f"{TELEGRAM_API}/bot{self.bot_token}/sendMessage"
-            payload = {
+            self._send({
                 "chat_id": user.telegram_chat_id,
                 "text": message,
                 "parse_mode": "HTML",
                 "disable_web_page_preview": False
-            }
-            
-            resp = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT)
-            resp.raise_for_status()
+            })
             
+            self._count("sent")
             logger.info(f"Sent alert to {user.email}: {scored.post.title[:40]}...")
             return True
             
+        except TelegramAPIError as e:
+            logger.error(f"Telegram error for {user.email}: {e.description}")
+            if e.is_blocked:
+                self._mark_blocked(user)
+            elif e.is_parse_error:
+                # Only retry as plain text when the HTML itself was rejected
+                return self._send_plain(user, scored)
         except requests.exceptions.RequestException as e:
-            if hasattr(e, 'response') and e.response is not None:
-                error_text = e.response.text
-                logger.error(f"Telegram error for {user.email}: {error_text}")
-                # If user blocked the bot, we could mark them inactive
-                if "bot was blocked" in error_text.lower():
-                    logger.warning(f"User {user.email} blocked the bot")
-            else:
-                logger.error(f"Failed to send to {user.email}: {e}")
-            return self._send_plain(user, scored)
+            logger.error(f"Failed to send to {user.email}: {e}")
+        
+        self._count("failed")
+        return False
     
     def _send_plain(self, user: User, scored: ScoredPost) -> bool:
         """Fallback: send as plain text."""
@@ -91,17 +213,103 @@ class TelegramNotifier:
             f"{post.url}"
         )
         
-        try:
-            url = f"{TELEGRAM_API}/bot{self.bot_token}/sendMessage"
-            payload = {
-                "chat_id": user.telegram_chat_id,
-                "text": message
-            }
+        if self.send_message(user.telegram_chat_id, message):
+            self._count("sent")
+            return True
+        self._count("failed")
+        return False
+    
+    def _format_digest_entry(self, index: int, scored: ScoredPost) -> str:
+        """One post as a compact block inside a digest."""
+        post = scored.post
+        title = post.title if len(post.title) <= DIGEST_TITLE_LIMIT else post.title[:DIGEST_TITLE_LIMIT] + "…"
+        skill_kw = ", ".join(scored.matched_skill_keywords) or "none"
+        
+        return (
+            f"{index}. <b>{self._escape_html(title)}</b>\n"
+            f"{post.platform} · score {scored.score} · skills: {self._escape_html(skill_kw)}\n"
+            f"🔗 {self._escape_html(post.url)}"
+        )
+    
+    def _format_digests(self, posts: List[ScoredPost]) -> List[tuple]:
+        """Pack posts into as few messages as fit Telegram's length limit.
+        
+        Returns (message, posts in that message) pairs.
+        """
+        chunks = []
+        current: List[str] = []
+        current_posts: List[ScoredPost] = []
+        # Room for the header line
+        budget = MAX_MESSAGE_LENGTH - 100
+        used = 0
+        
+        for index, scored in enumerate(posts, 1):
+            entry = self._format_digest_entry(index, scored)
+            if current and used + len(entry) + 2 > budget:
+                chunks.append((current, current_posts))
+                current, current_posts, used = [], [], 0
+            current.append(entry)
+            current_posts.append(scored)
+            used += len(entry) + 2
+        if current:
+            chunks.append((current, current_posts))
+        
+        total = len(posts)
+        messages = []
+        for part, (entries, chunk_posts) in enumerate(chunks, 1):
+            header = f"📬 <b>{total} New Opportunities</b>"
+            if len(chunks) > 1:
+                header += f" ({part}/{len(chunks)})"
+            messages.append((header + "\n\n" + "\n\n".join(entries), chunk_posts))
+        return messages
+    
+    def send_digest(self, user: User, posts: List[ScoredPost]) -> List[ScoredPost]:
+        """Send several matches as digest messages. Returns the posts delivered."""
+        if not user.telegram_chat_id or not posts:
+            return []
+        if len(posts) == 1:
+            return posts if self.send_to_user(user, posts[0]) else []
+        
+        delivered = []
+        for message, chunk_posts in self._format_digests(posts):
+            try:
+                self._send({
+                    "chat_id": user.telegram_chat_id,
+                    "text": message,
+                    "parse_mode": "HTML",
+                    "disable_web_page_preview": True
+                })
+            except TelegramAPIError as e:
+                logger.error(f"Telegram error for {user.email}: {e.description}")
+                if e.is_blocked:
+                    self._mark_blocked(user)
+                    break
+                if not (e.is_parse_error and self.send_message(
+                        user.telegram_chat_id, html.unescape(_TAG_RE.sub("", message)))):
+                    self._count("failed")
+                    continue
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Failed to send digest to {user.email}: {e}")
+                self._count("failed")
+                continue
             
-            resp = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT)
-            resp.raise_for_status()
+            self._count("sent")
+            delivered.extend(chunk_posts)
+        
+        logger.info(f"Sent digest of {len(delivered)}/{len(posts)} posts to {user.email}")
+        return delivered
+    
+    def send_message(self, chat_id: str, text: str, parse_mode: Optional[str] = None) -> bool:
+        """Send a free-form message to a chat."""
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        
+        try:
+            self._send(payload)
             return True
-        except:
+        except Exception as e:
+            logger.error(f"Error sending message to {chat_id}: {e}")
             return False
     
     def send_welcome(self, chat_id: str, email: str) -> bool:
@@ -113,18 +321,97 @@ class TelegramNotifier:
             f"💡 <i>Tip: Configure your skills in the dashboard to get relevant alerts.</i>"
         )
         
+        return self.send_message(chat_id, message, parse_mode="HTML")
+
+
+class AsyncTelegramNotifier(TelegramNotifier):
+    """Notifier for the asyncio runtime.
+    
+    Formatting, rate limits and counters are shared with TelegramNotifier;
+    the a-prefixed methods send through an httpx.AsyncClient and wait for
+    rate limits with asyncio.sleep instead of blocking a thread.
+    """
+    
+    def __init__(self, client, limiter: Optional[ChatRateLimiter] = None):
+        super().__init__()
+        self.client = client
+        if limiter is not None:
+            # Share buckets with the blocking notifier so both stay inside Telegram's limits
+            self.limiter = limiter
+    
+    async def _asend(self, payload: dict) -> dict:
+        chat_id = str(payload["chat_id"])
+        url = f"{TELEGRAM_API}/bot{self.bot_token}/sendMessage"
+        
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            wait = self.limiter.reserve(chat_id)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            
+            started = time.monotonic()
+            with external_call("telegram", "sendMessage"):
+                resp = await self.client.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+            self.latency.record(time.monotonic() - started)
+            
+            body = self._check_response(chat_id, resp)
+            if body is not None:
+                return body
+        
+        raise TelegramAPIError(429, "rate limited")
+    
+    async def asend_message(self, chat_id: str, text: str, parse_mode: Optional[str] = None) -> bool:
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        
         try:
-            url = f"{TELEGRAM_API}/bot{self.bot_token}/sendMessage"
-            payload = {
-                "chat_id": chat_id,
-                "text": message,
-                "parse_mode": "HTML"
-            }
-            resp = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT)
-            resp.raise_for_status()
+            await self._asend(payload)
             return True
-        except:
+        except Exception as e:
+            logger.error(f"Error sending message to {chat_id}: {e}")
             return False
+    
+    async def asend_to_user(self, user: User, scored: ScoredPost) -> bool:
+        """Async send_to_user."""
+        return bool(await self.asend_digest(user, [scored]))
+    
+    async def asend_digest(self, user: User, posts: List[ScoredPost]) -> List[ScoredPost]:
+        """Async send_digest; a single post is sent in the regular alert format."""
+        if not user.telegram_chat_id or not posts:
+            return []
+        
+        if len(posts) == 1:
+            messages = [(self._format_message(posts[0]), posts)]
+        else:
+            messages = self._format_digests(posts)
+        
+        delivered = []
+        for message, chunk_posts in messages:
+            try:
+                await self._asend({
+                    "chat_id": user.telegram_chat_id,
+                    "text": message,
+                    "parse_mode": "HTML",
+                    "disable_web_page_preview": len(posts) > 1
+                })
+            except TelegramAPIError as e:
+                logger.error(f"Telegram error for {user.email}: {e.description}")
+                if e.is_blocked:
+                    self._mark_blocked(user)
+                    break
+                if not (e.is_parse_error and await self.asend_message(
+                        user.telegram_chat_id, html.unescape(_TAG_RE.sub("", message)))):
+                    self._count("failed")
+                    continue
+            except Exception as e:
+                logger.error(f"Failed to send to {user.email}: {e}")
+                self._count("failed")
+                continue
+            
+            self._count("sent")
+            delivered.extend(chunk_posts)
+        
+        return delivered
 
 
 # Singleton instance
@@ -0,0 +1,358 @@
+"""Durable outbox for alert delivery, backed by SQLite."""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from .models import Post, ScoredPost, User
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    user_id TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def _encode(user: User, scored: ScoredPost) -> str:
+    """Everything needed to send the alert after a restart."""
+    post = scored.post
+    return json.dumps({
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "telegram_chat_id": user.telegram_chat_id,
+            "skill_keywords": user.skill_keywords,
+            "score_threshold": user.score_threshold,
+        },
+        "post": {
+            "id": post.id,
+            "platform": post.platform,
+            "title": post.title,
+            "content": post.content,
+            "url": post.url,
+            "timestamp": post.timestamp.isoformat(),
+        },
+        "score": scored.score,
+        "hiring": scored.matched_hiring_keywords,
+        "skills": scored.matched_skill_keywords,
+    })
+
+
+def _decode(payload: str) -> Tuple[User, ScoredPost]:
+    data = json.loads(payload)
+    post = data["post"]
+    scored = ScoredPost(
+        post=Post(
+            id=post["id"],
+            platform=post["platform"],
+            title=post["title"],
+            content=post["content"],
+            url=post["url"],
+            timestamp=datetime.fromisoformat(post["timestamp"])
+        ),
+        score=data["score"],
+        matched_hiring_keywords=data["hiring"],
+        matched_skill_keywords=data["skills"]
+    )
+    return User.from_dict(data["user"]), scored
+
+
+@dataclass
+class OutboxEntry:
+    """A queued alert."""
+    user: User
+    scored: ScoredPost
+    attempts: int
+
+
+class Outbox:
+    """Alerts waiting to be sent, persisted so none are lost on restart.
+    
+    Rows are keyed by (user_id, post_id) and deleted only once the alert is
+    sent and recorded, which gives at-least-once delivery. Failed sends are
+    retried with exponential backoff; after max_attempts, or when the user
+    has blocked the bot, rows move to the dead status and are kept for
+    inspection instead of being retried.
+    """
+    
+    def __init__(self, path: str, base_backoff_seconds: float = 30,
+                 max_backoff_seconds: float = 3600, max_attempts: int = 8):
+        self.path = path
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+    
+    def enqueue(self, user: User, posts: List[ScoredPost], delay: float = 0) -> int:
+        """Queue alerts for a user. Returns how many were not already queued."""
+        now = time.time()
+        rows = [
+            (user.id, scored.post.id, _encode(user, scored), now + delay, now)
+            for scored in posts
+        ]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO outbox (user_id, post_id, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            return self._db.total_changes - before
+    
+    def queued_for(self, user_id: str) -> Set[str]:
+        """Post IDs queued (or dead-lettered) for a user."""
+        with self._lock:
+            rows = self._db.execute("SELECT post_id FROM outbox WHERE user_id = ?", (user_id,)).fetchall()
+        return {row[0] for row in rows}
+    
+    def due(self, limit: int = 500, exclude: Optional[Set[Tuple[str, str]]] = None) -> List[OutboxEntry]:
+        """Pending alerts whose next attempt time has come, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user_id, post_id, payload, attempts FROM outbox "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (PENDING, time.time(), limit)
+            ).fetchall()
+        
+        entries = []
+        for user_id, post_id, payload, attempts in rows:
+            if exclude and (user_id, post_id) in exclude:
+                continue
+            user, scored = _decode(payload)
+            entries.append(OutboxEntry(user, scored, attempts))
+        return entries
+    
+    def ack(self, user_id: str, post_ids: List[str]):
+        """Remove alerts that were delivered."""
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM outbox WHERE user_id = ? AND post_id = ?",
+                [(user_id, post_id) for post_id in post_ids]
+            )
+    
+    def retry(self, entries: List[OutboxEntry], error: str):
+        """Schedule failed alerts again with exponential backoff."""
+        now = time.time()
+        updates = []
+        dead = []
+        for entry in entries:
+            attempts = entry.attempts + 1
+            key = (entry.user.id, entry.scored.post.id)
+            if attempts >= self.max_attempts:
+                dead.append((error, attempts) + key)
+            else:
+                backoff = min(self.base_backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+                updates.append((attempts, now + backoff, error) + key)
+        
+        with self._lock:
+            self._db.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE user_id = ? AND post_id = ?",
+                updates
+            )
+            self._db.executemany(
+                f"UPDATE outbox SET status = '{DEAD}', last_error = ?, attempts = ? "
+                "WHERE user_id = ? AND post_id = ?",
+                dead
+            )
+        if dead:
+            logger.warning(f"Dead-lettered {len(dead)} alerts after {self.max_attempts} attempts: {error}")
+    
+    def dead_letter_user(self, user_id: str, reason: str) -> int:
+        """Stop delivering anything queued for a user. Returns rows moved."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE outbox SET status = ?, last_error = ? WHERE user_id = ? AND status = ?",
+                (DEAD, reason, user_id, PENDING)
+            )
+            return cursor.rowcount
+    
+    def purge(self, max_age_seconds: float) -> int:
+        """Drop rows of any status older than max_age_seconds. Returns rows removed."""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM outbox WHERE created_at < ?", (time.time() - max_age_seconds,)
+            )
+            return cursor.rowcount
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of rows by status."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        result = {PENDING: 0, DEAD: 0}
+        result.update(dict(rows))
+        return result
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OutboxSender:
+    """Drains the outbox on a background thread.
+    
+    Due alerts are sent one by one, or grouped per user into a digest when
+    digest is set, either inline or through the delivery service when one
+    is configured. Delivered alerts are recorded through on_sent and then
+    removed from the outbox. When a user has blocked the bot, their queued
+    alerts are dead-lettered and on_blocked is called to deactivate them.
+    """
+    
+    def __init__(self, outbox: Outbox, notifier, on_sent: Callable[[User, ScoredPost], None],
+                 on_blocked: Callable[[User], None], delivery=None, digest: bool = False,
+                 max_age_seconds: float = 24 * 3600, poll_seconds: float = 1.0, batch_size: int = 500):
+        self.outbox = outbox
+        self.notifier = notifier
+        self.notifier.track_blocked = True
+        self.delivery = delivery
+        self.on_sent = on_sent
+        self.on_blocked = on_blocked
+        self.digest = digest
+        # Alerts for posts older than this are stale; drop them from the outbox
+        self.max_age_seconds = max_age_seconds
+        self._last_purge = 0.0
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self._in_flight: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.sent = 0
+        self.failed = 0
+        self.dead_lettered = 0
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+        self._thread.start()
+        logger.info(f"Outbox sender started ({self.outbox.counts()[PENDING]} alerts pending)")
+    
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                drained = self.drain()
+            except Exception as e:
+                logger.error(f"Outbox sender error: {e}")
+                drained = 0
+            if drained < self.batch_size:
+                self._stop.wait(self.poll_seconds)
+    
+    def drain(self) -> int:
+        """Send one batch of due alerts. Returns how many were attempted."""
+        with self._lock:
+            exclude = set(self._in_flight)
+        entries = self.outbox.due(self.batch_size, exclude)
+        
+        by_user: Dict[str, List[OutboxEntry]] = defaultdict(list)
+        for entry in entries:
+            by_user[entry.user.id].append(entry)
+        
+        for user_entries in by_user.values():
+            if self._stop.is_set():
+                break
+            if self.digest:
+                self._send(user_entries)
+            else:
+                for entry in user_entries:
+                    self._send([entry])
+        
+        if time.monotonic() - self._last_purge >= 600:
+            purged = self.outbox.purge(self.max_age_seconds)
+            if purged:
+                logger.info(f"Purged {purged} stale outbox rows")
+            self._last_purge = time.monotonic()
+        return len(entries)
+    
+    def _send(self, entries: List[OutboxEntry]):
+        user = entries[0].user
+        posts = [entry.scored for entry in entries]
+        
+        if self.delivery is None:
+            delivered = self.notifier.send_digest(user, posts)
+            self._finish(entries, {s.post.id for s in delivered})
+            return
+        
+        keys = {(user.id, s.post.id) for s in posts}
+        with self._lock:
+            self._in_flight.update(keys)
+        
+        outcomes: Dict[str, bool] = {}
+        # Entries the delivery service took; only known once submit returns,
+        # which may be after its worker has already reported some of them
+        job: List[OutboxEntry] = []
+        job_lock = threading.Lock()
+        
+        def callback(_user: User, scored: ScoredPost, ok: bool):
+            # Called once per queued post; finish when the whole job has reported
+            with job_lock:
+                outcomes[scored.post.id] = ok
+                finished = bool(job) and len(outcomes) == len(job)
+            if finished:
+                self._finish(job, {post_id for post_id, sent in outcomes.items() if sent})
+        
+        queued = {s.post.id for s in self.delivery.submit_digest(user, posts, callback)}
+        # Posts already in flight elsewhere stay in the outbox for a later batch
+        skipped = {(user.id, s.post.id) for s in posts if s.post.id not in queued}
+        with self._lock:
+            self._in_flight.difference_update(skipped)
+        with job_lock:
+            job.extend(entry for entry in entries if entry.scored.post.id in queued)
+            finished = bool(job) and len(outcomes) == len(job)
+        if finished:
+            self._finish(job, {post_id for post_id, sent in outcomes.items() if sent})
+    
+    def _finish(self, entries: List[OutboxEntry], delivered: Set[str]):
+        """Record outcomes of one send."""
+        user = entries[0].user
+        sent = [entry for entry in entries if entry.scored.post.id in delivered]
+        failed = [entry for entry in entries if entry.scored.post.id not in delivered]
+        
+        for entry in sent:
+            self.on_sent(user, entry.scored)
+        self.outbox.ack(user.id, [entry.scored.post.id for entry in sent])
+        
+        if failed:
+            if user.telegram_chat_id and self.notifier.pop_blocked(user.telegram_chat_id):
+                self.dead_lettered += self.outbox.dead_letter_user(user.id, "bot was blocked")
+                self.on_blocked(user)
+            else:
+                self.outbox.retry(failed, "send failed")
+        
+        with self._lock:
+            self.sent += len(sent)
+            self.failed += len(failed)
+            self._in_flight.difference_update((user.id, entry.scored.post.id) for entry in entries)
+    
+    def get_stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            **self.outbox.counts(),
+        }
@@ -4,6 +4,10 @@ import html
 from typing import List
 from .models import Post
 
+_TAG_RE = re.compile(r'<[^>]+>')
+_URL_RE = re.compile(r'https?://\S+|www\.\S+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 
 def normalize_text(text: str) -> str:
     """Normalize text for processing."""
@@ -14,17 +18,16 @@ def normalize_text(text: str) -> str:
     text = html.unescape(text)
     
     # Remove HTML tags
-    text = re.sub(r'<[^>]+>', ' ', text)
+    text = _TAG_RE.sub(' ', text)
     
     # Remove URLs
-    text = re.sub(r'https?://\S+', ' ', text)
-    text = re.sub(r'www\.\S+', ' ', text)
+    text = _URL_RE.sub(' ', text)
     
     # Lowercase
     text = text.lower()
     
     # Collapse whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
     
     # Strip
     text = text.strip()
@@ -34,7 +37,11 @@ def normalize_text(text: str) -> str:
 
 def extract_keywords(text: str, keywords: List[str]) -> List[str]:
     """Extract matching keywords from text."""
-    normalized = normalize_text(text)
+    return match_keywords(normalize_text(text), keywords)
+
+
+def match_keywords(normalized: str, keywords: List[str]) -> List[str]:
+    """Extract matching keywords from already-normalized text."""
     matched = []
     
     for keyword in keywords:
@@ -45,6 +52,13 @@ def extract_keywords(text: str, keywords: List[str]) -> List[str]:
     return matched
 
 
+def normalize_post(post: Post) -> Post:
+    """Normalize a post once and cache the result on it."""
+    if post.normalized_text is None:
+        post.normalized_text = normalize_text(post.raw_text)
+    return post
+
+
 def prepare_post_text(post: Post) -> str:
     """Prepare combined text from post for analysis."""
-    return normalize_text(post.raw_text)
+    return normalize_post(post).normalized_text
@@ -0,0 +1,225 @@
+"""Staged engine runtime that overlaps fetching, scoring and delivery."""
+import logging
+import queue
+import threading
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+from . import snapshot
+from .config import config
+from .metrics import ALERTS, POSTS_FETCHED, SOURCE_FETCH_SECONDS
+from .models import Post, ScoredPost, User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageStats:
+    """Counters for one pipeline stage."""
+    processed: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    # Time spent waiting for room in the next stage's queue
+    blocked_seconds: float = 0.0
+    max_queue_depth: int = 0
+
+
+class Pipeline:
+    """Runs the engine as ingest -> score -> deliver stages on separate threads.
+    
+    Each source is fetched on its own schedule and pushes batches into a
+    bounded score queue. A single scoring thread owns the post cache and
+    keyword index and fans matches out to delivery workers. Users are
+    hashed to a fixed worker so messages to one chat stay in order. Full
+    queues block the stage feeding them, which throttles fetching when
+    delivery falls behind.
+    """
+    
+    def __init__(self, engine, workers: int = None, queue_size: int = None):
+        self.engine = engine
+        self.workers = workers or config.delivery_workers
+        queue_size = queue_size or config.pipeline_queue_size
+        
+        # Batches carry their source and its state once the fetch returned
+        self.score_queue: "queue.Queue[Tuple[str, List[Post], Optional[dict]]]" = queue.Queue(queue_size)
+        self.deliver_queues: List["queue.Queue[Tuple[User, List[ScoredPost]]]"] = [
+            queue.Queue(queue_size) for _ in range(self.workers)
+        ]
+        self.sources: Dict[str, Callable[[], List[Post]]] = {
+            "reddit": engine.reddit.fetch,
+            "hackernews": engine.hackernews.fetch,
+        }
+        self.stats: Dict[str, StageStats] = {
+            "ingest": StageStats(),
+            "score": StageStats(),
+            "deliver": StageStats(),
+        }
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+    
+    def _record(self, stage: str, busy: float = 0.0, blocked: float = 0.0,
+                processed: int = 0, errors: int = 0):
+        """Add to a stage's counters."""
+        with self._stats_lock:
+            stats = self.stats[stage]
+            stats.busy_seconds += busy
+            stats.blocked_seconds += blocked
+            stats.processed += processed
+            stats.errors += errors
+    
+    def queue_depths(self) -> Dict[str, int]:
+        """Current number of items waiting in front of each stage."""
+        return {
+            "score": self.score_queue.qsize(),
+            "deliver": sum(q.qsize() for q in self.deliver_queues),
+        }
+    
+    def get_stats(self) -> Dict[str, dict]:
+        """Copy of per-stage counters plus current queue depths."""
+        depths = self.queue_depths()
+        with self._stats_lock:
+            result = {stage: asdict(stats) for stage, stats in self.stats.items()}
+        for stage, depth in depths.items():
+            result[stage]["queue_depth"] = depth
+        return result
+    
+    def _put(self, target: queue.Queue, item, producer: str, consumer: str) -> bool:
+        """Blocking put that applies back-pressure but still notices shutdown."""
+        started = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=1)
+            except queue.Full:
+                continue
+            self._record(producer, blocked=time.monotonic() - started)
+            depth = target.qsize()
+            with self._stats_lock:
+                stats = self.stats[consumer]
+                stats.max_queue_depth = max(stats.max_queue_depth, depth)
+            return True
+        return False
+    
+    def _get(self, source: queue.Queue):
+        """Blocking get that returns None on shutdown."""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=1)
+            except queue.Empty:
+                continue
+        return None
+    
+    def _ingest_loop(self, name: str, fetch: Callable[[], List[Post]]):
+        """Fetch one source on a fixed schedule and queue its posts."""
+        interval = config.poll_interval_seconds
+        next_run = time.monotonic()
+        
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                with SOURCE_FETCH_SECONDS.time(source=name):
+                    posts = fetch()
+                POSTS_FETCHED.inc(len(posts), source=name)
+                # This thread is the only one fetching the source, so its
+                # state can't move again before the batch is queued
+                state = snapshot.source_state(self.engine, name) if config.snapshot_path else None
+                self._record("ingest", busy=time.monotonic() - started, processed=len(posts))
+            except Exception as e:
+                logger.error(f"{name} fetch error: {e}")
+                self._record("ingest", busy=time.monotonic() - started, errors=1)
+                posts = []
+            
+            if posts and not self._put(self.score_queue, (name, posts, state), "ingest", "score"):
+                return
+            
+            # Fixed-rate schedule; if a fetch overran, start the next one now
+            next_run = max(next_run + interval, time.monotonic())
+            self._stop.wait(next_run - time.monotonic())
+    
+    def _worker_for(self, user_id: str) -> int:
+        return zlib.crc32(user_id.encode()) % self.workers
+    
+    def _score_loop(self):
+        """Cache, score and fan out each fetched batch."""
+        while not self._stop.is_set():
+            batch = self._get(self.score_queue)
+            if batch is None:
+                return
+            name, posts, state = batch
+            
+            started = time.monotonic()
+            try:
+                new_posts = self.engine.ingest_posts(posts)
+                if state is not None:
+                    self.engine.mark_ingested({name: state})
+                users = self.engine.load_users()
+                matches = self.engine.score_users(users)
+                self.engine.notified.sync()
+            except Exception as e:
+                logger.error(f"Scoring error: {e}")
+                self._record("score", busy=time.monotonic() - started, errors=1)
+                continue
+            self._record("score", busy=time.monotonic() - started, processed=len(new_posts))
+            
+            for user in users:
+                user_matches = matches.get(user.id, [])
+                if not user_matches and not self.engine.has_retries(user.id):
+                    continue
+                target = self.deliver_queues[self._worker_for(user.id)]
+                if not self._put(target, (user, user_matches), "score", "deliver"):
+                    return
+    
+    def _deliver_loop(self, index: int):
+        """Send queued matches for the users hashed to this worker."""
+        deliver_queue = self.deliver_queues[index]
+        mine = lambda user_id: self._worker_for(user_id) == index
+        
+        while not self._stop.is_set():
+            try:
+                user, matches = deliver_queue.get(timeout=1)
+            except queue.Empty:
+                user = None
+            
+            started = time.monotonic()
+            sent = self.engine.deliver(user, matches) if user is not None else 0
+            # Digests for this worker's users go out from here to keep chat order
+            sent += self.engine.flush_digests(select=mine)
+            if user is not None or sent:
+                self._record("deliver", busy=time.monotonic() - started, processed=sent)
+                ALERTS.inc(sent)
+    
+    def _spawn(self, name: str, target, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+    
+    def start(self):
+        """Start all stage threads."""
+        for name, fetch in self.sources.items():
+            self._spawn(f"ingest-{name}", self._ingest_loop, name, fetch)
+        self._spawn("score", self._score_loop)
+        for index in range(self.workers):
+            self._spawn(f"deliver-{index}", self._deliver_loop, index)
+        
+        logger.info(f"Pipeline started: {len(self.sources)} sources, {self.workers} delivery workers")
+    
+    def stop(self):
+        """Signal all stages to stop and wait for them."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+    
+    def run(self):
+        """Run until the engine is stopped, logging stage stats each interval."""
+        self.start()
+        last_report = time.monotonic()
+        try:
+            while self.engine.running:
+                self._stop.wait(1)
+                self.engine.save_snapshot()
+                if time.monotonic() - last_report >= config.poll_interval_seconds:
+                    logger.info(f"Pipeline stats: {self.get_stats()}")
+                    last_report = time.monotonic()
+        finally:
+            self.stop()
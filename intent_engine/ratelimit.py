@@ -0,0 +1,88 @@
+"""Token buckets for outbound API rate limits."""
+import threading
+import time
+from typing import Dict
+
+# Per-chat buckets idle this long are full again and can be forgotten
+IDLE_BUCKET_SECONDS = 300
+PRUNE_EVERY = 1000
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+    
+    reserve() always takes a token and returns how long the caller must wait
+    before using it, so concurrent callers queue up fairly instead of
+    spinning.
+    """
+    
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """Take a token. Returns seconds to wait before it may be used."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+    
+    def pause(self, seconds: float):
+        """Hold all reservations for a while (e.g. after a 429)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+    
+    def idle_for(self) -> float:
+        return time.monotonic() - self.updated
+
+
+class ChatRateLimiter:
+    """Global bucket plus one bucket per chat, as Telegram limits both."""
+    
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 1):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chats: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._acquired = 0
+    
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            
+            self._acquired += 1
+            if self._acquired % PRUNE_EVERY == 0:
+                for key in [k for k, b in self._chats.items() if b.idle_for() > IDLE_BUCKET_SECONDS]:
+                    del self._chats[key]
+            return bucket
+    
+    def acquire(self, chat_id: str) -> float:
+        """Block until a message to chat_id may be sent. Returns seconds waited."""
+        waited = 0.0
+        for bucket in (self._chat_bucket(chat_id), self.global_bucket):
+            wait = bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+                waited += wait
+        return waited
+    
+    def reserve(self, chat_id: str) -> float:
+        """Take tokens from both buckets without blocking. Returns seconds to wait.
+        
+        For callers that can't sleep the thread, e.g. on an event loop.
+        """
+        return max(self._chat_bucket(chat_id).reserve(), self.global_bucket.reserve())
+    
+    def pause(self, chat_id: str, seconds: float):
+        """Back off a chat after Telegram asked us to retry later."""
+        self._chat_bucket(chat_id).pause(seconds)
@@ -0,0 +1,115 @@
+"""Cached roster of active users, refreshed by change."""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from . import database
+from .models import User
+from .shard import ShardSpec
+
+logger = logging.getLogger(__name__)
+
+# Only what scoring and delivery need
+ROSTER_COLUMNS = "id,email,telegram_chat_id,skill_keywords,score_threshold,is_active,updated_at"
+
+
+@dataclass
+class RosterChanges:
+    """Users added, edited or dropped by a roster refresh."""
+    updated: List[User] = field(default_factory=list)
+    removed: Set[str] = field(default_factory=set)
+    # Subset of updated whose keywords or threshold changed
+    scoring_changed: Set[str] = field(default_factory=set)
+    
+    def __bool__(self) -> bool:
+        return bool(self.updated or self.removed)
+
+
+class UserRoster:
+    """Active users with Telegram linked, kept in memory between cycles.
+    
+    After one full load, each refresh only asks for rows whose updated_at is
+    at or after the newest one already seen; the schema's trigger bumps it
+    on every update. Deleted rows never show up that way, so a full reload
+    still happens every full_refresh_seconds. With a shard, users outside
+    it are treated as inactive.
+    """
+    
+    def __init__(self, full_refresh_seconds: float = 3600, shard: Optional[ShardSpec] = None):
+        self.full_refresh_seconds = full_refresh_seconds
+        self.shard = shard
+        self.users: Dict[str, User] = {}
+        self.watermark: Optional[str] = None
+        self._last_full = 0.0
+    
+    def __len__(self) -> int:
+        return len(self.users)
+    
+    def active_users(self) -> List[User]:
+        return list(self.users.values())
+    
+    def _advance(self, rows: List[dict]):
+        for row in rows:
+            updated_at = row.get("updated_at")
+            if updated_at and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+    
+    def _apply(self, row: dict, changes: RosterChanges):
+        """Add, update or drop one user row."""
+        user_id = row["id"]
+        current = self.users.get(user_id)
+        
+        owned = self.shard is None or self.shard.owns(user_id)
+        if not owned or not row.get("is_active", True) or not row.get("telegram_chat_id"):
+            if current is not None:
+                del self.users[user_id]
+                changes.removed.add(user_id)
+            return
+        
+        user = User.from_dict(row)
+        if user == current:
+            return
+        
+        self.users[user_id] = user
+        changes.updated.append(user)
+        if current is None or current.scoring_hash != user.scoring_hash:
+            changes.scoring_changed.add(user_id)
+    
+    def refresh(self) -> RosterChanges:
+        """Bring the roster up to date and report what changed."""
+        changes = RosterChanges()
+        full = (
+            self.watermark is None
+            or time.monotonic() - self._last_full >= self.full_refresh_seconds
+        )
+        
+        if full:
+            rows = database.get_active_users(ROSTER_COLUMNS)
+            if not rows and self.users:
+                # get_active_users returns [] on error; keep the current roster
+                logger.warning("Full roster refresh returned no users, keeping cached roster")
+                return changes
+            
+            seen = set()
+            for row in rows:
+                seen.add(row["id"])
+                self._apply(row, changes)
+            for user_id in list(self.users):
+                if user_id not in seen:
+                    del self.users[user_id]
+                    changes.removed.add(user_id)
+            self._last_full = time.monotonic()
+        else:
+            rows = database.get_users_updated_since(self.watermark, ROSTER_COLUMNS)
+            if rows is None:
+                return changes
+            for row in rows:
+                self._apply(row, changes)
+        
+        self._advance(rows)
+        if changes:
+            logger.info(
+                f"Roster: {len(self.users)} users, {len(changes.updated)} updated, "
+                f"{len(changes.removed)} removed ({'full' if full else 'incremental'} refresh)"
+            )
+        return changes
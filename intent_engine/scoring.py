@@ -1,8 +1,12 @@
 """Scoring logic for intent detection."""
 import logging
-from typing import List
+from bisect import bisect_right
+from collections import defaultdict
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from .models import Post, ScoredPost, User
-from .parse import extract_keywords, prepare_post_text
+from .parse import match_keywords, prepare_post_text
+from .matcher import KeywordAutomaton, normalize_keyword
 from .config import config
 
 logger = logging.getLogger(__name__)
@@ -17,10 +21,10 @@ def score_post_for_user(post: Post, user: User) -> ScoredPost:
     text = prepare_post_text(post)
     
     # Extract matches using global hiring keywords
-    hiring_matches = extract_keywords(text, config.hiring_keywords)
+    hiring_matches = match_keywords(text, config.hiring_keywords)
     
     # Extract matches using user's skill keywords
-    skill_matches = extract_keywords(text, user.skill_keywords)
+    skill_matches = match_keywords(text, user.skill_keywords)
     
     # Calculate score
     score = (
@@ -46,3 +50,160 @@ def filter_posts_for_user(posts: List[Post], user: User) -> List[ScoredPost]:
             results.append(scored)
     
     return results
+
+
+class KeywordIndex:
+    """Shared keyword index that scores a post for every user in one scan.
+    
+    A single automaton covers the global hiring keywords plus the union of
+    all users' skill keywords. An inverted map from keyword to user ids fans
+    the matches of each post out to per-user scores.
+    """
+    
+    def __init__(self, hiring_keywords: Optional[List[str]] = None):
+        if hiring_keywords is None:
+            hiring_keywords = config.hiring_keywords
+        self.hiring_keywords = [
+            k for k in (normalize_keyword(k) for k in hiring_keywords) if k
+        ]
+        self._user_keywords: Dict[str, List[str]] = {}
+        self._thresholds: Dict[str, int] = {}
+        self._keyword_users: Dict[str, Set[str]] = defaultdict(set)
+        self._automaton: Optional[KeywordAutomaton] = None
+        self._by_threshold: Optional[List[Tuple[int, str]]] = None
+        # Bumped whenever any user's keywords or threshold change
+        self.version = 0
+    
+    def __len__(self) -> int:
+        return len(self._user_keywords)
+    
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._user_keywords
+    
+    @property
+    def vocabulary(self) -> Set[str]:
+        """All keywords currently compiled into the automaton."""
+        return set(self.hiring_keywords) | set(self._keyword_users)
+    
+    def _compiled(self) -> KeywordAutomaton:
+        """Return the automaton, rebuilding it if the vocabulary changed."""
+        if self._automaton is None:
+            self._automaton = KeywordAutomaton(self.vocabulary)
+            logger.debug(f"Compiled keyword automaton with {len(self._automaton.keywords)} keywords")
+        return self._automaton
+    
+    def _users_up_to(self, score: int) -> List[str]:
+        """User ids whose threshold is met by a score alone."""
+        if self._by_threshold is None:
+            self._by_threshold = sorted(
+                (threshold, user_id) for user_id, threshold in self._thresholds.items()
+            )
+        end = bisect_right(self._by_threshold, score, key=itemgetter(0))
+        return [user_id for _, user_id in self._by_threshold[:end]]
+    
+    def update_user(self, user: User) -> bool:
+        """Add or update a user. Returns True if their config changed."""
+        keywords = [k for k in (normalize_keyword(k) for k in user.skill_keywords) if k]
+        old_keywords = self._user_keywords.get(user.id)
+        # The column is nullable; one None would break sorting for every user
+        threshold = user.score_threshold if user.score_threshold is not None else config.score_threshold
+        
+        if old_keywords == keywords and self._thresholds.get(user.id) == threshold:
+            return False
+        
+        if old_keywords is not None:
+            self._unlink(user.id, old_keywords)
+        
+        for keyword in keywords:
+            if keyword not in self._keyword_users:
+                self._automaton = None
+            self._keyword_users[keyword].add(user.id)
+        
+        self._user_keywords[user.id] = keywords
+        self._thresholds[user.id] = threshold
+        self._by_threshold = None
+        self.version += 1
+        return True
+    
+    def remove_user(self, user_id: str) -> bool:
+        """Drop a user from the index. Returns True if they were present."""
+        keywords = self._user_keywords.pop(user_id, None)
+        if keywords is None:
+            return False
+        
+        self._unlink(user_id, keywords)
+        del self._thresholds[user_id]
+        self._by_threshold = None
+        self.version += 1
+        return True
+    
+    def _unlink(self, user_id: str, keywords: List[str]):
+        """Remove a user from the inverted map for the given keywords."""
+        for keyword in set(keywords):
+            users = self._keyword_users.get(keyword)
+            if users is None:
+                continue
+            users.discard(user_id)
+            if not users:
+                del self._keyword_users[keyword]
+                self._automaton = None
+    
+    def sync_users(self, users: List[User]) -> Set[str]:
+        """Make the index match the given roster. Returns changed user ids."""
+        changed = {user.id for user in users if self.update_user(user)}
+        
+        active_ids = {user.id for user in users}
+        for user_id in list(self._user_keywords):
+            if user_id not in active_ids:
+                self.remove_user(user_id)
+        
+        return changed
+    
+    def score_post(self, post: Post, user_ids: Optional[Set[str]] = None) -> Dict[str, ScoredPost]:
+        """Score a post for all indexed users (or a subset) in one scan."""
+        found = self._compiled().search(prepare_post_text(post))
+        
+        hiring_matches = [k for k in self.hiring_keywords if k in found]
+        hiring_score = len(hiring_matches) * HIRING_KEYWORD_WEIGHT
+        
+        candidates = set(self._users_up_to(hiring_score))
+        for keyword in found:
+            candidates.update(self._keyword_users.get(keyword, ()))
+        if user_ids is not None:
+            candidates &= user_ids
+        
+        results = {}
+        for user_id in candidates:
+            skill_matches = [k for k in self._user_keywords[user_id] if k in found]
+            score = hiring_score + len(skill_matches) * SKILL_KEYWORD_WEIGHT
+            
+            if score >= self._thresholds[user_id]:
+                results[user_id] = ScoredPost(
+                    post=post,
+                    score=score,
+                    matched_hiring_keywords=list(hiring_matches),
+                    matched_skill_keywords=skill_matches
+                )
+        
+        return results
+    
+    def score_posts(self, posts: Iterable[Post], user_ids: Optional[Set[str]] = None) -> Dict[str, List[ScoredPost]]:
+        """Score and filter posts for every user. Returns matches by user id."""
+        results: Dict[str, List[ScoredPost]] = defaultdict(list)
+        
+        for post in posts:
+            for user_id, scored in self.score_post(post, user_ids).items():
+                results[user_id].append(scored)
+        
+        return results
+
+
+def create_keyword_index() -> KeywordIndex:
+    """Create the keyword index for the configured scoring backend."""
+    if config.scoring_backend == "sparse":
+        # Imported lazily so numpy/scipy are only loaded when selected
+        from .sparse_scoring import SparseKeywordIndex
+        return SparseKeywordIndex()
+    if config.scoring_backend != "index":
+        logger.warning(f"Unknown scoring backend '{config.scoring_backend}', using index")
+    return KeywordIndex()
@@ -0,0 +1,283 @@
+"""Partitioning users across hosts and worker processes."""
+import logging
+import multiprocessing
+import pickle
+import signal
+import time
+import zlib
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional
+from .config import config
+from .metrics import STAGE_SECONDS, registry
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Workers serve their own metrics; these are the parent's view of them
+SHARD_ALERTS = registry.counter(
+    "intent_engine_shard_alerts_total", "Alerts reported by each shard worker", ["worker"]
+)
+SHARD_CYCLE_SECONDS = registry.histogram(
+    "intent_engine_shard_cycle_seconds", "Time each shard worker took to score and deliver", ["worker"]
+)
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """The slice of users one process is responsible for.
+    
+    Hosts own users with crc32(user_id) % count == index. Worker processes
+    on a host split that slice again by the rest of the hash, so changing
+    the number of workers never moves users between hosts and no two
+    processes ever send to the same user.
+    """
+    index: int = 0
+    count: int = 1
+    worker: int = 0
+    workers: int = 1
+    
+    def owns(self, user_id: str) -> bool:
+        h = zlib.crc32(user_id.encode())
+        return h % self.count == self.index and (h // self.count) % self.workers == self.worker
+    
+    def for_worker(self, worker: int, workers: int) -> "ShardSpec":
+        return ShardSpec(self.index, self.count, worker, workers)
+    
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count} worker {self.worker}/{self.workers}"
+
+
+def _pack(posts: List[Post]) -> bytes:
+    """Serialize normalized posts, once per cycle for all workers."""
+    return pickle.dumps(
+        [
+            (p.id, p.platform, p.title, p.content, p.url, p.epoch, p.normalized_text)
+            for p in posts
+        ],
+        protocol=pickle.HIGHEST_PROTOCOL
+    )
+
+
+def _unpack(data) -> List[Post]:
+    posts = []
+    for post_id, platform, title, content, url, epoch, normalized_text in pickle.loads(data):
+        post = Post(post_id, platform, title, content, url, epoch)
+        post.normalized_text = normalized_text
+        posts.append(post)
+    return posts
+
+
+class PostSnapshot:
+    """Posts for one cycle in a shared memory block every worker reads."""
+    
+    def __init__(self, posts: List[Post]):
+        data = _pack(posts)
+        self.count = len(posts)
+        self.size = len(data)
+        self._shm = SharedMemory(create=True, size=max(1, self.size))
+        self._shm.buf[:self.size] = data
+    
+    @property
+    def name(self) -> str:
+        return self._shm.name
+    
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+    
+    @staticmethod
+    def read(name: str, size: int) -> List[Post]:
+        shm = SharedMemory(name=name)
+        try:
+            with shm.buf[:size] as view:
+                return _unpack(view)
+        finally:
+            shm.close()
+
+
+@dataclass
+class ShardResult:
+    """What one worker did in a cycle."""
+    users: int = 0
+    sent: int = 0
+    seconds: float = 0.0
+
+
+def _worker_main(spec: ShardSpec, conn):
+    """Entry point of a worker process: an engine scoped to one shard."""
+    # The parent handles signals and tells workers when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    
+    from .engine import IntentEngine
+    from . import database
+    
+    # Workers share the bot's global rate limit; each keeps its own outbox
+    config.telegram_global_rate /= spec.workers
+    config.outbox_path = f"{config.outbox_path}.{spec.worker}"
+    # The parent snapshots the window and sends it to new workers
+    config.snapshot_path = ""
+    
+    engine = IntentEngine()
+    engine.shard = spec
+    engine.roster.shard = spec
+    engine.running = True
+    if config.metrics_port:
+        # Each worker has its own registry, on the ports after the parent's
+        engine.start_metrics_server(config.metrics_port + 1 + spec.worker)
+    if engine.delivery is not None:
+        engine.delivery.start()
+    if engine.outbox_sender is not None:
+        engine.outbox_sender.start()
+    logger.info(f"Shard {spec} started")
+    
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            # Parent went away
+            break
+        if message[0] == "stop":
+            break
+        
+        _, name, size = message
+        started = time.monotonic()
+        result = ShardResult()
+        try:
+            engine.ingest_posts(PostSnapshot.read(name, size))
+            result.sent = engine.process_users()
+            result.users = len(engine.roster)
+        except Exception as e:
+            logger.error(f"Shard {spec} cycle error: {e}")
+        result.seconds = time.monotonic() - started
+        conn.send(result)
+    
+    engine.stop()
+    database.flush_notifications()
+
+
+class ShardPool:
+    """Runs scoring and delivery for this host's users in worker processes.
+    
+    The parent fetches and normalizes posts as usual. Each cycle, posts the
+    workers haven't seen yet are pickled once into a shared memory block;
+    every worker copies them into its own post window, then scores and
+    delivers for its hash partition of users. The parent waits for all of
+    them and adds up their counts. A worker that dies is restarted and sent
+    the whole window on the next cycle.
+    """
+    
+    def __init__(self, engine, workers: int):
+        self.engine = engine
+        self.workers = workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self._procs: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._conns = [None] * workers
+        # Highest post cache sequence each worker has been sent
+        self._shipped = [0] * workers
+    
+    def _spawn(self, worker: int):
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self.engine.shard.for_worker(worker, self.workers), child_conn),
+            name=f"shard-{worker}",
+            daemon=True
+        )
+        proc.start()
+        child_conn.close()
+        self._procs[worker] = proc
+        self._conns[worker] = parent_conn
+        self._shipped[worker] = 0
+    
+    def start(self):
+        for worker in range(self.workers):
+            self._spawn(worker)
+        logger.info(f"Started {self.workers} shard workers for shard {self.engine.shard.index}/{self.engine.shard.count}")
+    
+    def stop(self, timeout: float = 30.0):
+        for conn in self._conns:
+            try:
+                conn.send(("stop",))
+            except (OSError, AttributeError):
+                pass
+        for proc in self._procs:
+            if proc is None:
+                continue
+            proc.join(timeout)
+            if proc.is_alive():
+                logger.warning(f"{proc.name} did not stop, terminating")
+                proc.terminate()
+    
+    def _result(self, worker: int) -> Optional[ShardResult]:
+        """Wait for a worker's result; None if it died."""
+        conn = self._conns[worker]
+        proc = self._procs[worker]
+        try:
+            while not conn.poll(1.0):
+                if not proc.is_alive():
+                    return None
+            return conn.recv()
+        except (EOFError, OSError):
+            return None
+    
+    @STAGE_SECONDS.timed(stage="cycle")
+    def process_cycle(self) -> int:
+        """Run one polling cycle across all workers. Returns total alerts sent."""
+        engine = self.engine
+        logger.info("Starting poll cycle...")
+        
+        new_posts = engine.ingest_posts(engine.fetch_all())
+        engine.save_snapshot(idle=True)
+        logger.info(f"Processing {len(engine.post_cache)} recent posts ({len(new_posts)} new)")
+        if not engine.post_cache:
+            return 0
+        
+        for worker, proc in enumerate(self._procs):
+            if not proc.is_alive():
+                logger.warning(f"{proc.name} exited with code {proc.exitcode}, restarting")
+                self._spawn(worker)
+        
+        last_seq = engine.post_cache.last_seq
+        snapshot = PostSnapshot(list(engine.post_cache.since(min(self._shipped))))
+        try:
+            for conn in self._conns:
+                conn.send(("cycle", snapshot.name, snapshot.size))
+            results = [self._result(worker) for worker in range(self.workers)]
+        finally:
+            snapshot.close()
+        
+        total_sent = 0
+        users = 0
+        for worker, result in enumerate(results):
+            if result is None:
+                logger.error(f"shard-{worker} died during the cycle")
+                continue
+            self._shipped[worker] = last_seq
+            total_sent += result.sent
+            users += result.users
+            SHARD_ALERTS.inc(result.sent, worker=worker)
+            SHARD_CYCLE_SECONDS.observe(result.seconds, worker=worker)
+        
+        slowest = max((r.seconds for r in results if r is not None), default=0.0)
+        logger.info(
+            f"Cycle complete. Total alerts: {total_sent} for {users} users "
+            f"({snapshot.count} posts, {snapshot.size} bytes shared, slowest shard {slowest:.2f}s)"
+        )
+        return total_sent
+    
+    def run(self):
+        self.start()
+        try:
+            while self.engine.running:
+                started = time.monotonic()
+                try:
+                    self.process_cycle()
+                except Exception as e:
+                    logger.error(f"Cycle error: {e}")
+                
+                elapsed = time.monotonic() - started
+                time.sleep(max(0.0, config.poll_interval_seconds - elapsed))
+        finally:
+            self.stop()
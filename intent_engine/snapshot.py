@@ -0,0 +1,120 @@
+"""Warm-restart snapshots of the post window and ingest state.
+
+A snapshot is a JSON Lines file: one header line with the ingesters'
+seen IDs, Reddit validators and the HN cursor, then one line per post in
+arrival order with its normalized text, so loading it doesn't redo any
+parsing. Files are written to a temporary path and renamed into place,
+so a crash mid-write leaves the previous snapshot intact.
+
+The ingest state saved must never cover posts the window doesn't hold,
+or they would count as seen after a restart without ever being scored.
+Fetches mark IDs as seen before their posts reach the window, so callers
+capture source_state() once a fetch has returned and hand it back to
+save() only after those posts have been ingested.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, List
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+SOURCES = ("reddit", "hackernews")
+
+
+def source_state(engine, source: str) -> dict:
+    """One source's seen IDs and cursor, to be saved with the posts it has fetched so far."""
+    if source == "reddit":
+        return {
+            "seen": engine.reddit.seen_ids.state(),
+            "validators": engine.reddit.validators_state(),
+        }
+    return {
+        "seen": engine.hackernews.seen_ids.state(),
+        "last_max_id": engine.hackernews.last_max_id,
+    }
+
+
+def ingest_state(engine) -> Dict[str, dict]:
+    """State of every source; only consistent while no fetch is running."""
+    return {source: source_state(engine, source) for source in SOURCES}
+
+
+def save(engine, path: str, ingest: Dict[str, dict]) -> int:
+    """Write a snapshot to path. Returns the number of posts written.
+    
+    ingest must have been captured before every post it has seen was
+    added to the window; the window is read after it, so it holds them.
+    """
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        **ingest,
+    }
+    posts = engine.post_cache.snapshot()
+    
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(json.dumps(header) + "\n")
+        for post in posts:
+            f.write(json.dumps([
+                post.id, post.platform, post.title, post.content, post.url,
+                post.epoch, post.normalized_text
+            ]) + "\n")
+    os.replace(tmp_path, path)
+    return len(posts)
+
+
+def _read_posts(f) -> List[Post]:
+    posts = []
+    for line in f:
+        post_id, platform, title, content, url, epoch, normalized_text = json.loads(line)
+        post = Post(post_id, platform, title, content, url, epoch)
+        post.normalized_text = normalized_text
+        posts.append(post)
+    return posts
+
+
+def load(engine, path: str) -> int:
+    """Restore a snapshot into a freshly started engine. Returns posts restored.
+    
+    Posts that have aged out of the window since the snapshot was taken
+    are dropped; seen IDs expire on their own TTL. A missing or unreadable
+    snapshot leaves the engine untouched.
+    """
+    if not os.path.exists(path):
+        return 0
+    
+    started = time.monotonic()
+    try:
+        with open(path) as f:
+            header = json.loads(f.readline())
+            if header.get("version") != SNAPSHOT_VERSION:
+                logger.warning(f"Ignoring snapshot {path} with version {header.get('version')}")
+                return 0
+            posts = _read_posts(f)
+    except Exception as e:
+        logger.error(f"Error loading snapshot {path}: {e}")
+        return 0
+    
+    reddit = header["reddit"]
+    engine.reddit.seen_ids.restore(reddit["seen"])
+    engine.reddit.validators.update(reddit["validators"])
+    
+    hackernews = header["hackernews"]
+    engine.hackernews.seen_ids.restore(hackernews["seen"])
+    last_max_id = hackernews["last_max_id"]
+    if last_max_id is not None and (engine.hackernews.last_max_id or 0) < last_max_id:
+        engine.hackernews.last_max_id = last_max_id
+    
+    restored = engine.ingest_posts(posts)
+    logger.info(
+        f"Restored {len(restored)} of {len(posts)} posts from snapshot saved "
+        f"{time.time() - header['saved_at']:.0f}s ago in {time.monotonic() - started:.2f}s"
+    )
+    return len(restored)
@@ -0,0 +1,128 @@
+"""Batch scoring backend using sparse post x keyword matrices."""
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+from scipy import sparse
+from .models import Post, ScoredPost
+from .parse import prepare_post_text
+from .scoring import KeywordIndex, HIRING_KEYWORD_WEIGHT, SKILL_KEYWORD_WEIGHT
+
+logger = logging.getLogger(__name__)
+
+
+class SparseKeywordIndex(KeywordIndex):
+    """KeywordIndex that scores a whole batch of posts with one matrix product.
+    
+    Posts are scanned once into a sparse posts x vocabulary hit matrix, which
+    is multiplied by a vocabulary x users skill weight matrix. Hiring keyword
+    scores are shared by all users, so they are kept as a per-post vector and
+    compared against a per-user threshold vector.
+    """
+    
+    def __init__(self, hiring_keywords: Optional[List[str]] = None):
+        super().__init__(hiring_keywords)
+        self._matrix_version = -1
+        self._matrix_automaton = None
+    
+    def _build_matrices(self):
+        """Rebuild vocabulary and user weight matrices if the roster changed."""
+        automaton = self._compiled()
+        if self._matrix_version == self.version and self._matrix_automaton is automaton:
+            return
+        
+        self._vocab = sorted(automaton.keywords)
+        self._columns = {k: i for i, k in enumerate(self._vocab)}
+        self._user_ids = list(self._user_keywords)
+        self._user_rows = {u: i for i, u in enumerate(self._user_ids)}
+        
+        hiring = np.zeros(len(self._vocab), dtype=np.int64)
+        for keyword in self.hiring_keywords:
+            hiring[self._columns[keyword]] += HIRING_KEYWORD_WEIGHT
+        self._hiring_weights = hiring
+        
+        rows, cols = [], []
+        for user_index, user_id in enumerate(self._user_ids):
+            for keyword in self._user_keywords[user_id]:
+                rows.append(self._columns[keyword])
+                cols.append(user_index)
+        # Duplicate entries are summed, matching repeated keywords in a user's list
+        self._skill_weights = sparse.csr_matrix(
+            (np.full(len(rows), SKILL_KEYWORD_WEIGHT, dtype=np.int64), (rows, cols)),
+            shape=(len(self._vocab), len(self._user_ids))
+        )
+        
+        self._threshold_vector = np.array(
+            [self._thresholds[u] for u in self._user_ids], dtype=np.int64
+        )
+        self._threshold_order = np.argsort(self._threshold_vector, kind="stable")
+        self._sorted_thresholds = self._threshold_vector[self._threshold_order]
+        
+        self._matrix_version = self.version
+        self._matrix_automaton = automaton
+        logger.debug(f"Built sparse weights: {len(self._vocab)} keywords x {len(self._user_ids)} users")
+    
+    def score_posts(self, posts: Iterable[Post], user_ids: Optional[Set[str]] = None) -> Dict[str, List[ScoredPost]]:
+        """Score and filter posts for every user. Returns matches by user id."""
+        self._build_matrices()
+        posts = list(posts)
+        results: Dict[str, List[ScoredPost]] = {}
+        
+        if not posts or not self._user_ids:
+            return results
+        
+        automaton = self._matrix_automaton
+        found_sets = []
+        indptr, indices = [0], []
+        for post in posts:
+            found = automaton.search(prepare_post_text(post))
+            found_sets.append(found)
+            indices.extend(self._columns[k] for k in found)
+            indptr.append(len(indices))
+        
+        hits = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int64), indices, indptr),
+            shape=(len(posts), len(self._vocab))
+        )
+        hiring_scores = hits @ self._hiring_weights
+        skill_scores = (hits @ self._skill_weights).tocsr()
+        
+        allowed = None
+        if user_ids is not None:
+            allowed = np.zeros(len(self._user_ids), dtype=bool)
+            allowed[[self._user_rows[u] for u in user_ids if u in self._user_rows]] = True
+        
+        for post_index, post in enumerate(posts):
+            hiring_score = int(hiring_scores[post_index])
+            start, end = skill_scores.indptr[post_index], skill_scores.indptr[post_index + 1]
+            skill_users = skill_scores.indices[start:end]
+            totals = hiring_score + skill_scores.data[start:end]
+            
+            # Users with skill hits that clear their threshold
+            passing = skill_users[totals >= self._threshold_vector[skill_users]]
+            
+            # Users with no skill hits whose threshold the hiring score meets alone
+            cutoff = np.searchsorted(self._sorted_thresholds, hiring_score, side="right")
+            if cutoff:
+                hiring_only = np.setdiff1d(
+                    self._threshold_order[:cutoff], skill_users, assume_unique=True
+                )
+                passing = np.concatenate([passing, hiring_only])
+            
+            if allowed is not None:
+                passing = passing[allowed[passing]]
+            if not len(passing):
+                continue
+            
+            found = found_sets[post_index]
+            hiring_matches = [k for k in self.hiring_keywords if k in found]
+            for user_index in passing:
+                user_id = self._user_ids[user_index]
+                skill_matches = [k for k in self._user_keywords[user_id] if k in found]
+                results.setdefault(user_id, []).append(ScoredPost(
+                    post=post,
+                    score=hiring_score + len(skill_matches) * SKILL_KEYWORD_WEIGHT,
+                    matched_hiring_keywords=list(hiring_matches),
+                    matched_skill_keywords=skill_matches
+                ))
+        
+        return results
@@ -1,12 +1,20 @@
 """Telegram bot handler for user linking via /start command."""
+import asyncio
 import logging
+import queue
 import requests
+import threading
 import time
+import zlib
+from collections import deque
 from threading import Thread
+from typing import Deque, Dict, List, Optional, Set
 from .config import config
 from . import database
+from .metrics import LatencyStats, external_call, registry
 from .notify import get_notifier
 from .models import User
+from .webhook import WebhookServer
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +26,176 @@ def set_engine_ref(engine):
     global _engine_ref
     _engine_ref = engine
 
-TELEGRAM_API = "https://api.telegram.org"
+TELEGRAM_API = config.telegram_api_base
+
+# Log per-command latency this often
+STATS_INTERVAL_SECONDS = 300
+
+# Update IDs remembered for dedup; Telegram opens up to 40 webhook
+# connections, so redeliveries land well within this many updates
+RECENT_UPDATES = 1000
+
+# Commands labelled by name in metrics; anything else counts as "other"
+KNOWN_COMMANDS = {"/start", "/gift", "/help", "/status", "text"}
+
+BOT_COMMAND_SECONDS = registry.histogram(
+    "intent_engine_bot_command_seconds",
+    "Time from receiving a bot message to finishing its command",
+    ["command"]
+)
+
+
+def command_name(text: str) -> str:
+    """Command a message invokes, e.g. "/start" for "/start@Bot abc"."""
+    if not text.startswith("/"):
+        return "text"
+    return text.split()[0].split("@")[0].lower()
+
+
+class CommandDispatcher:
+    """Runs bot commands on a bounded pool of worker threads.
+    
+    Each chat is hashed to one worker, so a chat's commands run in the
+    order they arrived while slow commands in one chat don't hold up the
+    others. A full queue blocks the caller rather than dropping messages,
+    so the poll loop stops fetching until workers catch up. Latency from
+    receipt to completion is tracked per command.
+    """
+    
+    def __init__(self, handle, workers: int = 4, queue_size: int = 100):
+        self.handle = handle
+        self.workers = workers
+        self._queues: List["queue.Queue"] = [queue.Queue(queue_size) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self.latency: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+        # Times a submit found its worker's queue full and had to wait
+        self.stalled = 0
+    
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(index,), name=f"bot-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+    
+    def _queue_for(self, message: dict):
+        chat_id = str(message.get("chat", {}).get("id"))
+        return self._queues[zlib.crc32(chat_id.encode()) % self.workers]
+    
+    def _stalled(self, message: dict):
+        with self._lock:
+            self.stalled += 1
+        logger.debug(f"Bot worker queue full, waiting to queue message from chat {message.get('chat', {}).get('id')}")
+    
+    def submit(self, message: dict) -> bool:
+        """Queue a message for its chat's worker, waiting while the queue is full.
+        
+        Returns False only if the dispatcher stopped before taking it.
+        """
+        target = self._queue_for(message)
+        item = (message, time.monotonic())
+        if target.full():
+            self._stalled(message)
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _run(self, index: int):
+        source = self._queues[index]
+        while not self._stop.is_set():
+            try:
+                message, received = source.get(timeout=1)
+            except queue.Empty:
+                continue
+            
+            try:
+                self.handle(message)
+            except Exception as e:
+                logger.error(f"Error handling message: {e}")
+            self._record(message, received)
+    
+    def _record(self, message: dict, received: float):
+        command = command_name(message.get("text", ""))
+        seconds = time.monotonic() - received
+        self._stats_for(command).record(seconds)
+        BOT_COMMAND_SECONDS.observe(seconds, command=command if command in KNOWN_COMMANDS else "other")
+    
+    def _stats_for(self, command: str) -> LatencyStats:
+        with self._lock:
+            stats = self.latency.get(command)
+            if stats is None:
+                stats = self.latency[command] = LatencyStats()
+            return stats
+    
+    def get_stats(self) -> dict:
+        """Per-command latency, queue depth and stalls."""
+        with self._lock:
+            latency = dict(self.latency)
+        return {
+            "queued": sum(q.qsize() for q in self._queues),
+            "stalled": self.stalled,
+            "commands": {command: stats.summary() for command, stats in latency.items()},
+        }
+
+
+class AsyncCommandDispatcher(CommandDispatcher):
+    """CommandDispatcher for the asyncio runtime.
+    
+    Worker tasks take the place of threads. Command handlers still make
+    blocking database and Telegram calls, so each runs via asyncio.to_thread;
+    a chat's commands stay in order because its worker awaits one at a time.
+    """
+    
+    def __init__(self, handle, workers: int = 4, queue_size: int = 100):
+        super().__init__(handle, workers, queue_size)
+        self._queues = [asyncio.Queue(queue_size) for _ in range(workers)]
+        self._tasks: List[asyncio.Task] = []
+    
+    def start(self):
+        """Start worker tasks; must be called on the event loop."""
+        self._tasks = [
+            asyncio.create_task(self._arun(index), name=f"bot-{index}")
+            for index in range(self.workers)
+        ]
+    
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+    
+    async def asubmit(self, message: dict) -> bool:
+        """Async submit."""
+        target = self._queue_for(message)
+        item = (message, time.monotonic())
+        if target.full():
+            self._stalled(message)
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(target.put(item), timeout=1)
+                return True
+            except asyncio.TimeoutError:
+                continue
+        return False
+    
+    async def _arun(self, index: int):
+        source = self._queues[index]
+        while True:
+            message, received = await source.get()
+            try:
+                await asyncio.to_thread(self.handle, message)
+            except Exception as e:
+                logger.error(f"Error handling message: {e}")
+            self._record(message, received)
 
 
 class TelegramBotHandler:
@@ -28,21 +205,95 @@ class TelegramBotHandler:
         self.bot_token = config.telegram_bot_token
         self.last_update_id = 0
         self.running = False
+        self.session = requests.Session()
+        self.dispatcher = CommandDispatcher(self._handle_message, config.bot_workers, config.bot_queue_size)
+        self._update_lock = threading.Lock()
+        self._recent_updates: Deque[int] = deque()
+        self._recent_update_ids: Set[int] = set()
+        self._stopped = threading.Event()
+    
+    def _call(self, method: str, payload: dict) -> bool:
+        """Call a Bot API method. Returns whether it succeeded."""
+        try:
+            url = f"{TELEGRAM_API}/bot{self.bot_token}/{method}"
+            with external_call("telegram", method):
+                resp = self.session.post(url, json=payload, timeout=10)
+            body = resp.json()
+            if not body.get("ok"):
+                logger.error(f"{method} failed: {body.get('description')}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error calling {method}: {e}")
+            return False
+    
+    def _claim_update(self, update_id: Optional[int]) -> bool:
+        """Mark an update as seen. Returns False if it already was."""
+        if update_id is None:
+            return True
+        with self._update_lock:
+            # Telegram redelivers webhook updates it thinks failed, and
+            # parallel connections deliver them out of order, so check
+            # recent IDs rather than only the highest one
+            if update_id in self._recent_update_ids:
+                return False
+            self._recent_update_ids.add(update_id)
+            self._recent_updates.append(update_id)
+            if len(self._recent_updates) > RECENT_UPDATES:
+                self._recent_update_ids.discard(self._recent_updates.popleft())
+            return True
+    
+    def _settle_update(self, update_id: Optional[int], handled: bool):
+        """Move the polling offset past a handled update, or forget one that wasn't."""
+        if update_id is None:
+            return
+        with self._update_lock:
+            if handled:
+                self.last_update_id = max(self.last_update_id, update_id)
+            else:
+                self._recent_update_ids.discard(update_id)
+    
+    def _process_update(self, update: dict) -> bool:
+        """Hand an update to the dispatcher unless it was already seen.
+        
+        Waits while the chat's worker is backed up. Returns False if the
+        update wasn't taken, in which case the offset stays before it.
+        """
+        update_id = update.get("update_id")
+        if not self._claim_update(update_id):
+            return True
+        handled = "message" not in update or self.dispatcher.submit(update["message"])
+        self._settle_update(update_id, handled)
+        return handled
     
-    def _get_updates(self):
-        """Poll for new messages."""
+    async def _aprocess_update(self, update: dict) -> bool:
+        """Async _process_update."""
+        update_id = update.get("update_id")
+        if not self._claim_update(update_id):
+            return True
+        handled = "message" not in update or await self.dispatcher.asubmit(update["message"])
+        self._settle_update(update_id, handled)
+        return handled
+    
+    def _get_updates(self) -> Optional[list]:
+        """Poll for new messages. Returns None if the request failed."""
         try:
             url = f"{TELEGRAM_API}/bot{self.bot_token}/getUpdates"
             params = {
                 "offset": self.last_update_id + 1,
                 "timeout": 30
             }
-            resp = requests.get(url, params=params, timeout=35)
+            resp = self.session.get(url, params=params, timeout=35)
+            if resp.status_code == 409:
+                # A webhook left over from an earlier run blocks getUpdates
+                logger.warning("getUpdates conflicts with an active webhook, deleting it")
+                self._call("deleteWebhook", {})
+                return None
             resp.raise_for_status()
             return resp.json().get("result", [])
         except Exception as e:
             logger.error(f"Error getting updates: {e}")
-            return []
+            return None
     
     def _handle_message(self, message: dict):
         """Handle an incoming message."""
@@ -138,7 +389,7 @@ class TelegramBotHandler:
             self._send_message(chat_id, "❌ Failed to link account. Please try again.")
     
     def _send_welcome_posts(self, user_data: dict, chat_id: str):
-        """Send all matching posts from past 24h as a welcome gift."""
+        """Send the user's best matches from the past 24h as a welcome gift."""
         global _engine_ref
         
         if not _engine_ref:
@@ -150,18 +401,8 @@ class TelegramBotHandler:
             user_data["telegram_chat_id"] = chat_id
             user = User.from_dict(user_data)
             
-            # Get all cached posts from the engine
-            all_posts = list(_engine_ref.post_cache.values())
-            
-            if not all_posts:
-                logger.info(f"No cached posts to send as welcome gift")
-                return
-            
-            # Import here to avoid circular import
-            from .scoring import filter_posts_for_user
-            
-            # Score and filter posts for this user
-            scored_posts = filter_posts_for_user(all_posts, user)
+            # Best matches in the window, kept up to date by the engine's scoring
+            scored_posts = _engine_ref.top_matches_for(user)
             
             if not scored_posts:
                 logger.info(f"No matching posts for welcome gift to {user.email}")
@@ -171,56 +412,182 @@ class TelegramBotHandler:
             count = len(scored_posts)
             self._send_message(chat_id, 
                 f"🎁 Welcome Gift!\n\n"
-                f"Here are {count} opportunities from the past 24 hours that match your skills:"
+                f"Here are your top {count} opportunities from the past 24 hours that match your skills:"
             )
             
-            # Send each post
-            notifier = get_notifier()
-            sent = 0
-            for scored in scored_posts[:10]:  # Limit to 10 to avoid spam
-                if notifier.send_to_user(user, scored):
-                    database.update_user_last_notified(user.id, scored.post.id)
-                    sent += 1
-                time.sleep(0.5)  # Small delay to avoid rate limits
+            # Send them as one digest; rate limits are the notifier's job
+            delivered = get_notifier().send_digest(user, scored_posts)
+            for scored in delivered:
+                database.update_user_last_notified(user.id, scored.post.id)
+                _engine_ref.notified.add(user.id, scored.post.id)
+            sent = len(delivered)
             
             if sent > 0:
+                # Shard workers check the DB before alerting a newly linked user
+                database.get_notification_writer().flush()
                 logger.info(f"Sent {sent} welcome posts to {user.email}")
-                
-            if count > 10:
-                self._send_message(chat_id,
-                    f"📬 Showing top 10 of {count} matches. You'll get new ones as they come in!"
-                )
+            
+            self._send_message(chat_id, "📬 You'll get new ones as they come in!")
         except Exception as e:
             logger.error(f"Error sending welcome posts: {e}")
     
     def _send_message(self, chat_id: str, text: str):
         """Send a message to a chat."""
-        try:
-            url = f"{TELEGRAM_API}/bot{self.bot_token}/sendMessage"
-            payload = {"chat_id": chat_id, "text": text}
-            requests.post(url, json=payload, timeout=10)
-        except Exception as e:
-            logger.error(f"Error sending message: {e}")
+        # Shares the notifier's connection pool and rate limits
+        get_notifier().send_message(chat_id, text)
     
     def run(self):
-        """Run the bot polling loop."""
+        """Run the bot, by webhook if configured, otherwise by long polling."""
         self.running = True
-        logger.info("Telegram bot handler started")
+        self.dispatcher.start()
+        logger.info(f"Telegram bot handler started with {self.dispatcher.workers} workers")
+        
+        if config.telegram_bot_mode == "webhook" and self._run_webhook():
+            return
+        self._run_polling()
+    
+    def _start_webhook(self, on_update) -> Optional[tuple]:
+        """Start the webhook server and register it. Returns (server, registered) or None."""
+        try:
+            server = WebhookServer(
+                config.telegram_webhook_host,
+                config.telegram_webhook_port,
+                config.telegram_webhook_path,
+                config.telegram_webhook_secret,
+                on_update
+            )
+        except OSError as e:
+            logger.error(f"Could not start webhook server, falling back to polling: {e}")
+            return None
+        server.start()
+        
+        registered = False
+        if config.telegram_webhook_url:
+            registered = self._call("setWebhook", {
+                "url": config.telegram_webhook_url,
+                "secret_token": config.telegram_webhook_secret,
+                "allowed_updates": ["message"],
+            })
+            if not registered:
+                server.stop()
+                logger.error("setWebhook failed, falling back to polling")
+                return None
+        
+        logger.info(
+            f"Receiving updates on port {server.port}{config.telegram_webhook_path}"
+            + ("" if registered else " (not registered with Telegram)")
+        )
+        return server, registered
+    
+    def _stop_webhook(self, server: WebhookServer, registered: bool):
+        if registered:
+            self._call("deleteWebhook", {})
+        server.stop()
+    
+    def _run_webhook(self) -> bool:
+        """Serve webhook updates until stopped. Returns False if it couldn't start."""
+        started = self._start_webhook(self._process_update)
+        if started is None:
+            return False
+        
+        try:
+            while self.running:
+                self._stopped.wait(STATS_INTERVAL_SECONDS)
+                logger.info(f"Bot command stats: {self.dispatcher.get_stats()}")
+        finally:
+            self._stop_webhook(*started)
+        return True
+    
+    def _run_polling(self):
+        """Long-poll getUpdates until stopped."""
+        last_report = time.monotonic()
         
         while self.running:
             updates = self._get_updates()
+            if updates is None:
+                # Back off only on errors; a long poll already waits for updates
+                time.sleep(1)
+                continue
+            
+            for update in updates:
+                # Stopped mid-batch; the rest are fetched again next time
+                if not self._process_update(update):
+                    break
+            
+            if time.monotonic() - last_report >= STATS_INTERVAL_SECONDS:
+                logger.info(f"Bot command stats: {self.dispatcher.get_stats()}")
+                last_report = time.monotonic()
+    
+    async def arun(self, client):
+        """Run the bot on the event loop, polling through an httpx.AsyncClient."""
+        self.running = True
+        self.dispatcher = AsyncCommandDispatcher(self._handle_message, config.bot_workers, config.bot_queue_size)
+        self.dispatcher.start()
+        logger.info(f"Telegram bot handler started with {self.dispatcher.workers} worker tasks")
+        
+        try:
+            if config.telegram_bot_mode == "webhook" and await self._arun_webhook():
+                return
+            await self._arun_polling(client)
+        finally:
+            self.dispatcher.stop()
+    
+    async def _arun_webhook(self) -> bool:
+        loop = asyncio.get_running_loop()
+        # Updates arrive on server threads; each waits for the loop to queue it
+        on_update = lambda update: asyncio.run_coroutine_threadsafe(self._aprocess_update(update), loop).result()
+        started = await asyncio.to_thread(self._start_webhook, on_update)
+        if started is None:
+            return False
+        
+        try:
+            while self.running:
+                await asyncio.sleep(STATS_INTERVAL_SECONDS)
+                logger.info(f"Bot command stats: {self.dispatcher.get_stats()}")
+        finally:
+            await asyncio.to_thread(self._stop_webhook, *started)
+        return True
+    
+    async def _aget_updates(self, client) -> Optional[list]:
+        """Async _get_updates."""
+        try:
+            resp = await client.get(
+                f"{TELEGRAM_API}/bot{self.bot_token}/getUpdates",
+                params={"offset": self.last_update_id + 1, "timeout": 30},
+                timeout=35
+            )
+            if resp.status_code == 409:
+                logger.warning("getUpdates conflicts with an active webhook, deleting it")
+                await asyncio.to_thread(self._call, "deleteWebhook", {})
+                return None
+            resp.raise_for_status()
+            return resp.json().get("result", [])
+        except Exception as e:
+            logger.error(f"Error getting updates: {e}")
+            return None
+    
+    async def _arun_polling(self, client):
+        last_report = time.monotonic()
+        
+        while self.running:
+            updates = await self._aget_updates(client)
+            if updates is None:
+                await asyncio.sleep(1)
+                continue
             
             for update in updates:
-                self.last_update_id = update.get("update_id", self.last_update_id)
-                
-                if "message" in update:
-                    self._handle_message(update["message"])
+                if not await self._aprocess_update(update):
+                    break
             
-            time.sleep(1)
+            if time.monotonic() - last_report >= STATS_INTERVAL_SECONDS:
+                logger.info(f"Bot command stats: {self.dispatcher.get_stats()}")
+                last_report = time.monotonic()
     
     def stop(self):
         """Stop the bot."""
         self.running = False
+        self._stopped.set()
+        self.dispatcher.stop()
 
 
 def start_bot_handler():
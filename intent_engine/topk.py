@@ -0,0 +1,108 @@
+"""Best matches per user, kept up to date as posts are scored."""
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+from .models import ScoredPost
+
+# Heap entries order by score, then recency; post id breaks ties
+_Entry = Tuple[int, int, str, ScoredPost]
+
+
+def rank_matches(matches: Iterable[ScoredPost]) -> List[ScoredPost]:
+    """Sort matches best first: highest score, then newest."""
+    return sorted(matches, key=lambda s: (s.score, s.post.epoch, s.post.id), reverse=True)
+
+
+class TopMatches:
+    """Bounded min-heap of each user's K best matches in the post window.
+    
+    The scoring thread adds matches as it finds them; bot threads read a
+    user's ranked list in O(K log K). A heap that had to drop matches to stay
+    within K can't refill itself when its entries expire; complete() tells
+    readers to rescan the window and refill() it, which keeps expiry from
+    costing the scoring thread a full re-score.
+    """
+    
+    def __init__(self, k: int = 10):
+        self.k = k
+        self._heaps: Dict[str, List[_Entry]] = {}
+        # Users whose heap has dropped a match that is still in the window
+        self._overflowed: Set[str] = set()
+        # Overflowed users who have since lost matches to expiry
+        self._stale: Set[str] = set()
+        self._lock = threading.Lock()
+    
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._heaps
+    
+    def add(self, user_id: str, matches: Iterable[ScoredPost]):
+        """Offer new matches for a user."""
+        with self._lock:
+            self._add(user_id, matches)
+    
+    def _add(self, user_id: str, matches: Iterable[ScoredPost]):
+        heap = self._heaps.setdefault(user_id, [])
+        known = {entry[2] for entry in heap}
+        
+        for scored in matches:
+            post = scored.post
+            if post.id in known:
+                continue
+            entry = (scored.score, post.epoch, post.id, scored)
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+                known.add(post.id)
+                continue
+            
+            self._overflowed.add(user_id)
+            if entry[:3] > heap[0][:3]:
+                known.discard(heapq.heapreplace(heap, entry)[2])
+                known.add(post.id)
+    
+    def refill(self, user_id: str, matches: Iterable[ScoredPost]):
+        """Add all of a user's matches in the window, making their heap complete again."""
+        with self._lock:
+            self._add(user_id, matches)
+            self._stale.discard(user_id)
+    
+    def reset(self, user_id: str):
+        """Forget a user's matches before they are scored from scratch."""
+        with self._lock:
+            self._heaps[user_id] = []
+            self._overflowed.discard(user_id)
+            self._stale.discard(user_id)
+    
+    def remove(self, user_id: str):
+        with self._lock:
+            self._heaps.pop(user_id, None)
+            self._overflowed.discard(user_id)
+            self._stale.discard(user_id)
+    
+    def expire(self, cutoff: datetime):
+        """Drop matches older than cutoff."""
+        cutoff_epoch = cutoff.timestamp()
+        with self._lock:
+            for user_id, heap in self._heaps.items():
+                live = [entry for entry in heap if entry[1] >= cutoff_epoch]
+                if len(live) == len(heap):
+                    continue
+                heapq.heapify(live)
+                self._heaps[user_id] = live
+                if user_id in self._overflowed:
+                    self._stale.add(user_id)
+    
+    def complete(self, user_id: str) -> bool:
+        """Whether a user's heap still holds their best K matches in the window.
+        
+        False once a heap that dropped matches has lost entries to expiry,
+        since a dropped match may now belong in it.
+        """
+        with self._lock:
+            return user_id in self._heaps and user_id not in self._stale
+    
+    def top(self, user_id: str) -> List[ScoredPost]:
+        """A user's best matches, ranked."""
+        with self._lock:
+            entries = list(self._heaps.get(user_id, ()))
+        return [entry[3] for entry in sorted(entries, key=lambda e: e[:3], reverse=True)]
@@ -0,0 +1,85 @@
+"""HTTP endpoint that receives Telegram updates pushed by setWebhook."""
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Updates are small; refuse anything that clearly isn't one
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def _make_handler(path: str, secret: str, on_update: Callable[[dict], bool]):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug(f"Webhook {self.address_string()} {format % args}")
+        
+        def _reply(self, status: int):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        
+        def do_POST(self):
+            if self.path.split("?")[0] != path:
+                self._reply(404)
+                return
+            
+            token = self.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(token.encode(), secret.encode()):
+                logger.warning(f"Rejected webhook call with bad secret from {self.address_string()}")
+                self._reply(403)
+                return
+            
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self._reply(400)
+                return
+            
+            try:
+                update = json.loads(self.rfile.read(length))
+            except ValueError:
+                self._reply(400)
+                return
+            
+            # Acknowledge once queued; the update is handled on the bot's workers
+            try:
+                queued = on_update(update)
+            except Exception as e:
+                logger.error(f"Error queueing webhook update: {e}")
+                queued = True
+            # Telegram retries updates that weren't acknowledged
+            self._reply(200 if queued else 503)
+    
+    return Handler
+
+
+class WebhookServer:
+    """Threaded HTTP server for Telegram webhook updates.
+    
+    Requests must carry the secret token given to setWebhook in the
+    X-Telegram-Bot-Api-Secret-Token header. Each accepted update is passed
+    to on_update, which may block while the bot is backed up and returns
+    whether it took the update.
+    """
+    
+    def __init__(self, host: str, port: int, path: str, secret: str,
+                 on_update: Callable[[dict], bool]):
+        self.server = ThreadingHTTPServer((host, port), _make_handler(path, secret, on_update))
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="telegram-webhook", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
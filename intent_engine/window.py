@@ -0,0 +1,101 @@
+"""Time-bounded window of recent posts."""
+import heapq
+import threading
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+from .models import Post
+
+# Compact the arrival log once this many expired entries pile up at its head
+COMPACT_THRESHOLD = 1024
+
+
+class PostWindow:
+    """Posts from the last N hours, keyed by id.
+
+    Posts are indexed three ways: by id for lookups, in a heap by timestamp
+    so expiry only touches the posts that actually expire, and in an
+    arrival-ordered log so consumers can ask for everything added since a
+    sequence number they saw earlier.
+    """
+
+    def __init__(self, max_age_hours: int = 24):
+        self.max_age = timedelta(hours=max_age_hours)
+        self.last_seq = 0
+        self._posts: Dict[str, Post] = {}
+        self._expiry: List[Tuple[int, int, str]] = []
+        self._arrivals: List[Tuple[int, Post]] = []
+        self._head = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def __contains__(self, post_id: str) -> bool:
+        return post_id in self._posts
+
+    def __iter__(self) -> Iterator[Post]:
+        return iter(self._posts.values())
+
+    def values(self):
+        """Live view of the posts in the window (no copy)."""
+        return self._posts.values()
+
+    def get(self, post_id: str) -> Optional[Post]:
+        return self._posts.get(post_id)
+
+    def snapshot(self) -> List[Post]:
+        """Copy of the window that is safe to use from another thread."""
+        with self._lock:
+            return list(self._posts.values())
+
+    def add(self, post: Post) -> bool:
+        """Add a post and stamp its arrival sequence. Returns False if known."""
+        with self._lock:
+            if post.id in self._posts:
+                return False
+
+            self.last_seq += 1
+            post.seq = self.last_seq
+            self._posts[post.id] = post
+            heapq.heappush(self._expiry, (post.epoch, post.seq, post.id))
+            self._arrivals.append((post.seq, post))
+            return True
+
+    def expire(self, now: Optional[datetime] = None) -> int:
+        """Drop posts older than the window. Returns the number evicted."""
+        cutoff = ((now or datetime.now()) - self.max_age).timestamp()
+        evicted = 0
+
+        with self._lock:
+            while self._expiry and self._expiry[0][0] < cutoff:
+                _, seq, post_id = heapq.heappop(self._expiry)
+                post = self._posts.get(post_id)
+                if post is not None and post.seq == seq:
+                    del self._posts[post_id]
+                    evicted += 1
+
+            self._compact()
+
+        return evicted
+
+    def _compact(self):
+        """Trim expired posts from the head of the arrival log."""
+        arrivals = self._arrivals
+        while self._head < len(arrivals) and not self._is_live(arrivals[self._head][1]):
+            self._head += 1
+
+        if self._head >= COMPACT_THRESHOLD and self._head * 2 >= len(arrivals):
+            del arrivals[:self._head]
+            self._head = 0
+
+    def _is_live(self, post: Post) -> bool:
+        return self._posts.get(post.id) is post
+
+    def since(self, seq: int) -> Iterator[Post]:
+        """Posts still in the window that arrived after the given sequence."""
+        start = bisect_right(self._arrivals, seq, lo=self._head, key=itemgetter(0))
+        for _, post in self._arrivals[start:]:
+            if self._is_live(post):
+                yield post
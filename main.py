@@ -4,8 +4,10 @@ import logging
 import signal
 import sys
 
+from intent_engine import database
+from intent_engine.config import config
 from intent_engine.engine import IntentEngine
-from intent_engine.telegram_bot import start_bot_handler, set_engine_ref
+from intent_engine.telegram_bot import TelegramBotHandler, start_bot_handler, set_engine_ref
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,13 +26,27 @@ def main():
     # Set engine reference for telegram bot (for welcome posts)
     set_engine_ref(engine)
     
+    # Only one host may poll the bot; with SHARD_COUNT > 1 that is shard 0
+    run_bot = config.shard_index == 0
+    
+    if config.runtime == "asyncio":
+        # Engine and bot share one event loop; SIGINT/SIGTERM cancel it cleanly
+        from intent_engine import aio
+        aio.run(engine, TelegramBotHandler() if run_bot else None)
+        return
+    
     # Start Telegram bot handler (for /start linking)
-    bot_handler = start_bot_handler()
+    bot_handler = start_bot_handler() if run_bot else None
+    
+    def stop_all():
+        engine.stop()
+        if bot_handler is not None:
+            bot_handler.stop()
+        database.flush_notifications()
     
     def shutdown(signum, frame):
         logger.info("Shutdown signal received")
-        engine.stop()
-        bot_handler.stop()
+        stop_all()
         sys.exit(0)
     
     signal.signal(signal.SIGINT, shutdown)
@@ -39,8 +55,7 @@ def main():
     try:
         engine.run()
     except KeyboardInterrupt:
-        engine.stop()
-        bot_handler.stop()
+        stop_all()
     except Exception as e:
         logger.error(f"Fatal error: {e}")
         sys.exit(1)